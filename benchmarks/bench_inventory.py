@@ -0,0 +1,42 @@
+"""Micro-benchmark: single-pass inventory parser vs. one regex search per item.
+
+Run from the repository root with `python -m benchmarks.bench_inventory`.
+"""
+import re
+import timeit
+
+from utils.inventory import parse_inventory
+
+ITEMS = [
+    "wooden log", "epic log", "super log", "mega log", "hyper log", "ultra log",
+    "normie fish", "golden fish", "epic fish", "apple", "banana", "ruby",
+]
+LOOKUPS = ["wooden log", "normie fish", "apple", "ruby", "golden fish", "epic fish",
+           "epic log", "super log", "mega log", "hyper log", "ultra log"]
+
+SAMPLE = "\n".join(f"<:{name.replace(' ', '')}:123456789> **{name}**: {i * 1234:,}" for i, name in enumerate(ITEMS, 1)).lower()
+
+
+def old_get_count(item_name, text):
+    # The previous Trades.get_count: a new pattern and a full scan per item
+    match = re.search(rf"\*\*{re.escape(item_name)}\*\*:\s*([\d,]+)", text)
+    if match:
+        return int(match.group(1).replace(",", ""))
+    return 0
+
+
+def old_approach():
+    return {item: old_get_count(item, SAMPLE) for item in LOOKUPS}
+
+
+def new_approach():
+    inv = parse_inventory(SAMPLE)
+    return {item: inv.get(item, 0) for item in LOOKUPS}
+
+
+if __name__ == "__main__":
+    assert old_approach() == new_approach()
+    runs = 20_000
+    for name, func in (("per-item regex", old_approach), ("single pass", new_approach)):
+        total = timeit.timeit(func, number=runs)
+        print(f"{name:>15}: {total / runs * 1e6:7.2f} µs per inventory")
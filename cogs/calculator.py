@@ -3,6 +3,7 @@ from discord.ext import commands
 import re
 from math import floor
 import asyncio
+from utils.inventory import parse_inventory_embed
 
 class Calculator(commands.Cog):
     def __init__(self, bot):
@@ -17,6 +18,12 @@ class Calculator(commands.Cog):
             "TOP": [2, 4, 250]
         }
 
+    async def cog_load(self):
+        self.bot.router.add_prefix(self, "rpg i", self.process_calculator_logic)
+
+    async def cog_unload(self):
+        self.bot.router.remove_owner(self)
+
     def get_growth_factor(self, area):
         """Calculates total value multiplier based on guide milestones."""
         m = 1.0
@@ -39,13 +46,29 @@ class Calculator(commands.Cog):
         apple = inv.get('apple', 0) + (inv.get('banana', 0) * 12)
         return wood, fish, apple
 
+    async def scrape_inventory(self, message):
+        """Waits for the RPG bot's inventory reply to `message` and parses it."""
+        name = message.author.name.lower()
+
+        def check(m):
+            if m.channel.id != message.channel.id or not m.embeds:
+                return False
+            author = str(m.embeds[0].author.name).lower()
+            return "inventory" in author and name in author
+
+        try:
+            reply = await self.bot.wait_for("message", check=check, timeout=10.0)
+        except asyncio.TimeoutError:
+            return None
+        return parse_inventory_embed(reply.embeds[0])
+
     async def process_calculator_logic(self, message):
         content = message.content.lower()
         match = re.search(r"rpg\s+i\s+(\d+)", content)
         if not match: return
         
         current_area = int(match.group(1))
-        inv = await self.scrape_inventory(message) # Uses your existing scraper
+        inv = await self.scrape_inventory(message)
         if not inv: return
 
         w, f, a = self.dismantle_all(inv)
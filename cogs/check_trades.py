@@ -1,9 +1,13 @@
-from math import floor
 import discord
 from discord.ext import commands
 import re
 import asyncio
 from datetime import datetime, timedelta
+from utils.inventory import parse_inventory_embed
+from utils.rest import PRIORITY_TRADE
+from utils.trade_plan import (
+    AREA_MAP, AREA_RATIOS, BASE_GUIDES, BASE_ITEMS, DISMANTLE_RETURNS, TRADE_IDS, format_amount, plan_trades
+)
 
 class Trades(commands.Cog):
     def __init__(self, bot):
@@ -11,58 +15,30 @@ class Trades(commands.Cog):
         self.active_sessions = {}
         self.bot.loop.create_task(self.session_cleanup_loop())
         self.CAP_LIMIT = 25_000_000_000
-        self.dismantle_returns = {
-            "ultra log": ("hyper log", 10),
-            "hyper log": ("mega log", 10),
-            "mega log": ("super log", 10),
-            "super log": ("epic log", 10),
-            "epic log": ("wooden log", 25),
-            "banana": ("apple", 15),
-            "epic fish": ("golden fish", 100),
-            "golden fish": ("normie fish", 15)
-        }
-
-        self.trade_ids = {
-            "fish": "a", "apple": "c", "ruby": "e",
-            "log_to_fish": "b", "log_to_apple": "d", "log_to_ruby": "f",
-        }
-
-        self.area_ratios = {
-            1: {"log_to_fish": 1}, 2: {"log_to_fish": 1},
-            3: {"log_to_fish": 1, "log_to_apple": 3},
-            4: {"log_to_fish": 2, "log_to_apple": 4},
-            5: {"log_to_fish": 2, "log_to_apple": 4, "log_to_ruby": 450},
-            6: {"log_to_fish": 3, "log_to_apple": 15, "log_to_ruby": 675},
-            7: {"log_to_fish": 3, "log_to_apple": 15, "log_to_ruby": 675},
-            8: {"log_to_fish": 3, "log_to_apple": 8, "log_to_ruby": 675},
-            9: {"log_to_fish": 2, "log_to_apple": 12, "log_to_ruby": 850},
-            10: {"log_to_fish": 3, "log_to_apple": 12, "log_to_ruby": 500},
-            11: {"log_to_ruby": 500}, 12: {"log_to_ruby": 500},
-            13: {"log_to_ruby": 500}, 14: {"log_to_ruby": 500},
-        }
-
-        self.base_guides = {
-            2: {"dismantle": ["epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["log to fish"]},
-            3: {"dismantle": ["banana", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["apple to log", "log to fish"]},
-            4: {"dismantle": ["golden fish", "epic fish", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["fish to log", "log to apple"]},
-            5: {"dismantle": ["golden fish", "epic fish", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["ruby to log", "fish to log", "log to apple"]},
-            7: {"dismantle": ["banana"], "trades": ["apple to log"]},
-            8: {"dismantle": ["golden fish", "epic fish", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["ruby to log", "fish to log", "log to apple"]},
-            9: {"dismantle": ["banana", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["ruby to log", "apple to log", "log to fish"]},
-            10: {"dismantle": ["banana"], "trades": ["apple to log"]},
-            11: {"dismantle": [], "trades": ["ruby to log"]},
-            12: {"dismantle": [], "trades": []},
-            15: {"dismantle": ["banana", "golden fish", "epic fish"], "trades": ["ruby to log", "fish to log"]}
-        }
-        self.area_map = {1 : 2, 6: 7, 13 : 12, 14 : 12}
-
-    def get_count(self, item_name, text):
-        # Regex matches the bold name and captures the following number/commas
-        match = re.search(rf"\*\*{re.escape(item_name)}\*\*:\s*([\d,]+)", text)
-        if match:
-            return int(match.group(1).replace(",", ""))
-        return 0
-    
+        self.dismantle_returns = DISMANTLE_RETURNS
+        self.trade_ids = TRADE_IDS
+        self.area_ratios = AREA_RATIOS
+        self.base_guides = BASE_GUIDES
+        self.area_map = AREA_MAP
+        self.routed_channels = set()
+
+    async def cog_load(self):
+        # Commands that start or drive a session; RPG bot replies are routed per session channel
+        for prefix in ("rpg p trd", "rpg dismantle", "rpg trade"):
+            self.bot.router.add_prefix(self, prefix, self.process_trade_logic)
+
+    async def cog_unload(self):
+        self.bot.router.remove_owner(self)
+
+    def sync_session_routes(self):
+        """Routes messages (and edits) in channels with an active session to this cog."""
+        active = {session["channel_id"] for session in self.active_sessions.values()}
+        for channel_id in active - self.routed_channels:
+            self.bot.router.add_channel(self, channel_id, self.process_trade_logic, edits=True)
+        for channel_id in self.routed_channels - active:
+            self.bot.router.remove_channel(self, channel_id)
+        self.routed_channels = active
+
     async def session_cleanup_loop(self):
         await self.bot.wait_until_ready()
         while not self.bot.is_closed():
@@ -79,10 +55,13 @@ class Trades(commands.Cog):
                 session = self.active_sessions[uid]
                 channel = self.bot.get_channel(session["channel_id"])
                 if channel:
-                    await channel.send(f"⏰ Session for <@{uid}> expired due to inactivity.")
+                    await self.send_prompt(channel, f"⏰ Session for <@{uid}> expired due to inactivity.")
                 del self.active_sessions[uid]
                 print(f"CLEANUP: Removed inactive session for {uid}")
 
+            if to_delete:
+                self.sync_session_routes()
+
             await asyncio.sleep(30) # Check every 30 seconds
 
     async def process_trade_logic(self, message):
@@ -94,7 +73,7 @@ class Trades(commands.Cog):
             self.active_sessions[uid] = {
                 "user_id": uid,
                 "username": str(message.author.name).lower(),
-                "todo_list": [], "trade_list": [],
+                "plan": None,
                 "logic_area": None, "real_area": 0,
                 "status": "WAITING_FOR_PROFILE",
                 "channel_id": message.channel.id,
@@ -104,6 +83,7 @@ class Trades(commands.Cog):
                 "pending_dismantle": None # Track what we just asked to dismantle
                 
             }
+            self.sync_session_routes()
             return
 
         # 2. Track USER Dismantle Commands
@@ -177,7 +157,8 @@ class Trades(commands.Cog):
                     session["real_area"] = area
                     session["logic_area"] = self.area_map.get(area, area)
                     session["status"] = "ACTIVE"
-                    await message.channel.send(
+                    await self.send_prompt(
+                        message.channel,
                         f"⚠️ **Warning**! There might be malfunctions in the current testing phase.\n"
                         f"Please do not use **work** commands during sessions!\n"
                         f"✅ **Area {area}** locked for **{session['username']}**. Please Run `rpg i`.\n")
@@ -195,30 +176,11 @@ class Trades(commands.Cog):
                     if yield_item == "log": yield_item = "wooden log"
                     
                     pending = session.get("pending_dismantle")
-                    if pending:
-                        high_tier_item = pending["item"]
-                        # LOGIC FIX: We update the virtual inventory ONCE here.
-                        # We do NOT do it again in refresh_tasks.
-                        session["virtual_inv"][high_tier_item] = max(0, session["virtual_inv"].get(high_tier_item, 0) - pending["amount"])
-                        session["virtual_inv"][yield_item] = session["virtual_inv"].get(yield_item, 0) + got_amt
-                        
-                        print(f"DEBUG: Virtual Update: -{pending['amount']} {high_tier_item}, +{got_amt} {yield_item}")
-                        # Use self.dismantle_returns (your variable name in the new code)
-                        recipe = self.dismantle_returns.get(high_tier_item)
-                        
-                        if recipe:
-                            _, recipe_amt = recipe
-                            expected_yield = floor(pending["amount"] * recipe_amt * 0.8)
-                            
-                            # Validation logic
-                            if got_amt == expected_yield:
-                                print(f"✅ Verified Dismantle: {high_tier_item}")
-                            else:
-                                print(f"⚠️ Yield mismatch: Expected {expected_yield}, got {got_amt}")
-
                     session["pending_dismantle"] = None
-                    await self.refresh_tasks(target_uid)
-                    await self.send_next_command(message.channel, target_uid)
+                    if pending and session.get("plan"):
+                        await self.verify_step(
+                            message.channel, target_uid, "dismantle", pending["item"], pending["amount"], yield_item, got_amt
+                        )
 
             # Trade Result Detector
             elif embed and any(x in str(embed.fields[0].name if embed.fields else "").lower() for x in ["traded items", "trade is done"]):
@@ -234,16 +196,17 @@ class Trades(commands.Cog):
                         gave_amt = int(gave_match.group(2).replace(",", ""))
                         got_amt = int(npc_match.group(2).replace(",", ""))
 
-                        await self.refresh_tasks(target_uid, None, virtual_update=(gave_item, gave_amt, got_item, got_amt))
-                    
-                    await self.send_next_command(message.channel, target_uid)
+                        if session.get("plan"):
+                            await self.verify_step(
+                                message.channel, target_uid, "trade", gave_item, gave_amt, got_item, got_amt
+                            )
 
             # Inventory Detector
             elif embed and "inventory" in str(embed.author.name).lower():
                 # Verify it's the right user's inventory
-                if session["username"] in str(embed.author.name).lower():
-                    await self.refresh_tasks(target_uid, embed)
-                    await self.send_next_command(message.channel, target_uid)
+                # The plan is made once from the first inventory, later `rpg i` calls don't reset it
+                if session["username"] in str(embed.author.name).lower() and session["status"] == "ACTIVE" and not session.get("plan"):
+                    await self.start_plan(message.channel, target_uid, embed)
     
     def identify_user(self, message):
         # 1. Check Embeds first (standard RPG behavior)
@@ -267,28 +230,79 @@ class Trades(commands.Cog):
         
         return None
 
-    async def send_next_command(self, channel, uid):
+    # --- TRADE PLAN ---
+    def make_plan(self, session, inventory):
+        guide = self.base_guides.get(session["logic_area"], {"dismantle": [], "trades": []})
+        ratios = self.area_ratios.get(session["real_area"], {})
+        return plan_trades(inventory, guide, ratios, self.dismantle_returns, self.trade_ids)
+
+    def format_plan(self, session, plan, title):
+        lines = [f"📋 **{title}** for **{session['username']}** (Area {session['real_area']}, {len(plan.steps)} steps)"]
+        for number, step in enumerate(plan.steps, start=1):
+            lines.append(
+                f"`{number}.` `{step.command}` → **{format_amount(step.gets_amount)}** {step.gets}"
+                f" (for {format_amount(step.gives_amount)} {step.gives})"
+            )
+        final = " | ".join(f"{format_amount(count)} {item}" for item, count in plan.final.items() if item in BASE_ITEMS.values())
+        lines.append(f"🎯 **Expected result:** {final or 'nothing to trade'}")
+        lines.append("Run the commands in order, each result is checked against the plan.")
+        return "\n".join(lines)
+
+    async def start_plan(self, channel, uid, embed):
+        """Plans the whole dismantle/trade sequence from the inventory and shows it in one message."""
+        session = self.active_sessions[uid]
+        guide = self.base_guides.get(session["logic_area"], {"dismantle": [], "trades": []})
+        inv = parse_inventory_embed(embed)
+        session["virtual_inv"] = {item: inv.get(item, 0) for item in (*BASE_ITEMS.values(), *guide["dismantle"])}
+
+        plan = self.make_plan(session, session["virtual_inv"])
+        if not plan.steps:
+            return await self.finish_session(channel, uid)
+        session["plan"] = plan
+        await self.send_prompt(channel, self.format_plan(session, plan, "Trade plan"))
+
+    async def verify_step(self, channel, uid, kind, gives, gives_amount, gets, gets_amount):
+        """Checks an RPG bot result against the plan. Only a mismatch makes it plan again."""
+        session = self.active_sessions[uid]
+        plan = session["plan"]
+        inv = session["virtual_inv"]
+        inv[gives] = max(0, inv.get(gives, 0) - gives_amount)
+        inv[gets] = inv.get(gets, 0) + gets_amount
+
+        index = plan.find(kind, gives, gets)
+        step = plan.steps[index] if index is not None else None
+        # An unknown (None) planned amount takes whatever the RPG bot reports
+        expected = ((step.gives_amount, gives_amount), (step.gets_amount, gets_amount)) if step else ()
+        if step and index == plan.done and all(want is None or want == got for want, got in expected):
+            print(f"✅ Verified step {index + 1}: {step.command}")
+            plan.done += 1
+            if None in (step.gives_amount, step.gets_amount):
+                # Now that the yield is known, the remaining steps are planned from the real inventory
+                plan = session["plan"] = self.make_plan(session, inv)
+            if plan.current is None:
+                await self.finish_session(channel, uid)
+            return
+
+        # Off-plan command, skipped step or different amounts: plan the rest from what we actually have
+        if step:
+            print(f"⚠️ Step mismatch on {step.command}: expected {step.gets_amount} {step.gets}, got {gets_amount}")
+        plan = self.make_plan(session, inv)
+        if not plan.steps:
+            return await self.finish_session(channel, uid)
+        session["plan"] = plan
+        await self.send_prompt(channel, self.format_plan(session, plan, "Result differed from the plan, updated plan"))
+
+    async def finish_session(self, channel, uid):
         session = self.active_sessions.get(uid)
-        print(f"--- DEBUG: Attempting to send command. Todo: {session.get('todo_list')} | Trade: {session.get('trade_list')} ---")
-        if not session: return
-
-        # 1. DISMANTLE FIRST: Check the guide's dismantle list
-        if session.get("todo_list"):
-            item = session["todo_list"].pop(0)
-            session["last_action"] = "dismantle" # Set this so we can catch the success message
-            return await channel.send(f"```rpg dismantle {item} all```")
-
-        # 2. TRADE SECOND: If nothing left to dismantle, start trading
-        if session.get("trade_list"):
-            tid = session["trade_list"][0] # Peek (pop happens in refresh_tasks or after confirmation)
-            session["last_action"] = "trade"
-            return await channel.send(f"```rpg trade {tid} all```")
-        
-        # 3. GOAL REACHED
-        area_num = session.get("real_area", "?")
-        await channel.send(f"✅ **Optimized!** Area {area_num} finished.")
+        area_num = session.get("real_area", "?") if session else "?"
+        await self.send_prompt(channel, f"✅ **Optimized!** Area {area_num} finished.")
         if uid in self.active_sessions:
             del self.active_sessions[uid]
+            self.sync_session_routes()
+
+    async def send_prompt(self, channel, content):
+        # Trade prompts yield to event announcements and permission edits
+        return await self.bot.rest.run(f"send:{channel.id}", lambda: channel.send(content), priority=PRIORITY_TRADE)
 
     def extract_area(self, embed):
         # Combine all possible text sources from the embed
@@ -309,62 +323,5 @@ class Trades(commands.Cog):
         fallback = re.search(r"area\*\*[:\s]*(\d+)", full_text, re.I)
         return int(fallback.group(1)) if fallback else None
 
-    async def refresh_tasks(self, uid, embed=None, virtual_update=None):
-        session = self.active_sessions[uid]
-        guide = self.base_guides.get(session["logic_area"], {"dismantle": [], "trades": []})
-        
-        # 1. INITIAL SEED (Only from 'rpg i')
-        if embed:
-            field_0_value = embed.fields[0].value.lower()
-            
-            # Start with base items
-            session["virtual_inv"] = {
-                "wooden log": self.get_count("wooden log", field_0_value),
-                "normie fish": self.get_count("normie fish", field_0_value),
-                "apple": self.get_count("apple", field_0_value),
-                "ruby": self.get_count("ruby", field_0_value)
-            }
-            # Add high tier items found in the embed
-            for item in guide["dismantle"]:
-              session["virtual_inv"][item] = self.get_count(item, field_0_value)
-
-        # DYNAMICALLY ADD HIGHER ITEMS FROM YOUR GUIDE
-        # This captures: epic log, super log, mega log, hyper log, ultra log, golden fish, epic fish, etc.
-        todos = []
-        for item in guide["dismantle"]:
-            if session["virtual_inv"].get(item, 0) > 0:
-              # We only add it if it's not already the current action
-              todos.append(item)
-            
-        # Important: Reverse the list so it dismantles from highest to lowest (Ultra -> Hyper -> Mega)
-        session["todo_list"] = list(reversed(todos)) 
-        print(f"DEBUG: Updated Todo List: {session['todo_list']}")
-        print(f"--- Inventory Seeded (Virtual): {session['virtual_inv']} ---")
-
-        # 2. VIRTUAL UPDATE (For Trades)
-        if virtual_update:
-            gave_item, gave_amt, got_item, got_amt = virtual_update
-            if gave_item in session["virtual_inv"]:
-                session["virtual_inv"][gave_item] -= gave_amt
-            if got_item in session["virtual_inv"]:
-                session["virtual_inv"][got_item] += got_amt
-            print(f"--- Virtual Trade Update: {gave_item} -> {got_item} | New Inv: {session['virtual_inv']} ---")
-
-        # 3. REBUILD TRADE QUEUE (Only if todo_list is empty)
-        new_trades = []
-        if not session.get("todo_list"):
-            ratios = self.area_ratios.get(session["real_area"], {})
-            for t_str in guide["trades"]:
-                parts = t_str.split(" to ")
-                source, target = parts[0], parts[1]
-                search_name = "wooden log" if source == "log" else "normie fish" if source == "fish" else source
-                key = f"log_to_{target}" if source == "log" else source
-                
-                if session["virtual_inv"].get(search_name, 0) >= (ratios.get(key, 1) if source == "log" else 1):
-                    tid = self.trade_ids.get(key)
-                    if tid: new_trades.append(tid)
-
-        session["trade_list"] = new_trades
-
 async def setup(bot):
     await bot.add_cog(Trades(bot))
\ No newline at end of file
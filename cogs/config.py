@@ -1,6 +1,8 @@
 import discord
 import os
 from discord.ext import commands
+from utils.cache import RenderCache
+from utils.models import EventConfig
 
 class ConfigView(discord.ui.View):
     def __init__(self, bot, squad_data):
@@ -40,8 +42,8 @@ class ConfigView(discord.ui.View):
                 return await msg.reply("❌ Cancelled.")
             
             # Update Data
-            self.data["server_configs"]["global"]["event_configs"][event_key]["msg"] = msg.content
-            self.bot.save_data()
+            self.data.config.event_configs.setdefault(event_key, EventConfig()).msg = msg.content
+            self.bot.save_config()
             await msg.reply(f"✅ Updated {event_key} message to: `{msg.content}`")
         except Exception as e:
             await interaction.followup.send("⚠️ Timed out or error occurred.", ephemeral=True)
@@ -66,44 +68,54 @@ class GlobalSettings(commands.Cog):
             "ohmmm": "<:energy:1467083714440859729>",
             "lucky rewards": "<:idlons:1467083126512681094>"
         }
+        # Rendered settings embed, tagged with the compiled config version
+        self.embed_cache = RenderCache(maxsize=4)
 
     @commands.command(name="config")
     @commands.has_permissions(administrator=True)
     async def server_settings(self, ctx):
-        embed = discord.Embed(
-            title="⚙️ Global Event Settings",
-            description="Manage your squadron event pings and messages below.",
-            color=discord.Color.green()
-        )
-        
         # --- LOCAL IMAGE LOGIC ---
         image_path = r"images\emojis\1467082633123987537.webp"
         file = None
+        has_image = os.path.exists(image_path)
         
-        if os.path.exists(image_path):
-            # Create the discord File object
+        if has_image:
+            # Create the discord File object (a fresh one every time, it can only be sent once)
             file = discord.File(image_path, filename="summon_icon.webp")
+
+        embed = self.embed_cache.render(
+            has_image, self.bot.compiled_config.version, lambda: self.render_settings(has_image)
+        )
+
+        # Send both the file AND the embed together
+        if file:
+            await ctx.send(file=file, embed=embed, view=ConfigView(self.bot, self.data))
+        else:
+            await ctx.send(embed=embed, view=ConfigView(self.bot, self.data))
+
+    def render_settings(self, has_image):
+        embed = discord.Embed(
+            title="⚙️ Global Event Settings",
+            description="Manage your squadron event pings and messages below.",
+            color=discord.Color.green()
+        )
+        if has_image:
             # Link the embed thumbnail to the attachment name
             embed.set_thumbnail(url="attachment://summon_icon.webp")
         
-        configs = self.data["server_configs"]["global"].get("event_configs", {})
+        configs = self.data.config.event_configs
         
         for event, details in configs.items():
             emoji = self.event_emojis.get(event.lower(), "❓")
-            role_mention = f"<@&{details['role']}>"
+            role_mention = f"<@&{details.role}>"
             field_name = f"{emoji} {event.upper()}"
             
             embed.add_field(
                 name=field_name, 
-                value=f"**Role:** {role_mention}\n**Message:** {details['msg']}", 
+                value=f"**Role:** {role_mention}\n**Message:** {details.msg}", 
                 inline=True
             )
-
-        # Send both the file AND the embed together
-        if file:
-            await ctx.send(file=file, embed=embed, view=ConfigView(self.bot, self.data))
-        else:
-            await ctx.send(embed=embed, view=ConfigView(self.bot, self.data))
+        return embed
 
 async def setup(bot):
     await bot.add_cog(GlobalSettings(bot, bot.squad_data, bot.save_data))
\ No newline at end of file
@@ -1,126 +1,353 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
+import re
 import time
+from typing import Optional
+from utils.cache import LRUCache, TTLCache
+from utils.history import EventHistory
+from utils.rest import PRIORITY_EVENT
+
+# (button label, emoji token) -> event key, matching the keys in event_configs.
+# A None token matches any emoji. Tokens for the same label are tried in this order.
+BUTTON_EVENTS = {
+    ("JOIN", "swords"): "arena",
+    ("JOIN", "idlons"): "lucky rewards",
+    ("JOIN", "dagger"): "miniboss", # Fallback for IDLONS join
+    ("PACK", None): "pack",
+    ("OHMMM", None): "ohmmm",
+    ("SUMMON", None): "summon",
+    ("TIME TO FIGHT", None): "boss",
+    ("LETS GET THAT PICKAXE", None): "pickaxe",
+    ("CATCH", None): "catch",
+    ("CUT", None): "cut",
+    ("LURE", None): "lure",
+}
+
+# Seconds after its start an event is treated as stuck and ended automatically
+EVENT_EXPIRY = 600
+HISTORY_FILE = "event_history.json"
+
+class TimerWheel:
+    """Hashed timer wheel for event expiry deadlines.
+
+    Timers are stored in `slots` buckets of `tick` seconds each, so adding and
+    cancelling are O(1) and advancing only looks at the buckets whose ticks
+    passed. Deadlines further out than one rotation simply stay in their
+    bucket until a later pass reaches them.
+    """
+
+    def __init__(self, tick=1.0, slots=512, now=None):
+        self.tick = tick
+        self.slots = slots
+        self.buckets = [{} for _ in range(slots)]
+        # key -> bucket index
+        self.where = {}
+        self.current = int((now if now is not None else time.time()) // tick)
+
+    def add(self, key, deadline):
+        self.cancel(key)
+        index = max(int(deadline // self.tick), self.current + 1) % self.slots
+        self.buckets[index][key] = deadline
+        self.where[key] = index
+
+    def cancel(self, key):
+        index = self.where.pop(key, None)
+        if index is not None:
+            del self.buckets[index][key]
+
+    def advance(self, now):
+        """Returns every key whose deadline is <= now."""
+        target = int(now // self.tick)
+        # After a long pause every bucket is visited once instead of once per missed tick
+        steps = min(target - self.current, self.slots)
+        expired = []
+        for offset in range(1, steps + 1):
+            bucket = self.buckets[(self.current + offset) % self.slots]
+            due = [key for key, deadline in bucket.items() if deadline <= now]
+            for key in due:
+                del bucket[key]
+                del self.where[key]
+            expired.extend(due)
+        self.current = max(self.current, target)
+        return expired
+
+    def __len__(self):
+        return len(self.where)
+
+def build_button_table(button_events):
+    """Groups BUTTON_EVENTS by label so a button needs one dict lookup."""
+    table = {}
+    for (label, token), event in button_events.items():
+        table.setdefault(label, []).append((token, event))
+    return table
 
 class EventTracker(commands.Cog):
     def __init__(self, bot, data, save_func):
         self.bot = bot
         self.data = data
         self.save_data = save_func
-        self.last_event_time = {}
+        # (message id, phase, event) keys make each start/end run exactly once, even across edits.
+        # (channel id, phase, event) keys with a short TTL keep the old time-window debounce.
+        self.handled_events = TTLCache(maxsize=4096, ttl=900)
+        self.button_table = build_button_table(BUTTON_EVENTS)
+        # (message id, components fingerprint) -> parse_buttons result
+        self.button_memo = LRUCache(maxsize=512)
+        # (channel id, event) -> deadline, for events whose end message never arrives
+        self.expiry_wheel = TimerWheel()
+        # Every start/end, for ?eventstats
+        self.history = EventHistory.load(HISTORY_FILE)
+
+    async def cog_load(self):
+        self.register_bot_routes(self.bot.compiled_config.bot_ids)
+
+        # Deadlines are persisted with the squadron, so stuck events still expire after a restart
+        now = time.time()
+        for channel_id, squad in self.data.squadrons.items():
+            for event_type in squad.active_events:
+                deadline = squad.event_deadlines.setdefault(event_type, now + EVENT_EXPIRY)
+                self.expiry_wheel.add((channel_id, event_type), deadline)
+        self.expire_events.start()
+        self.rollup_history.start()
+
+    def register_bot_routes(self, bot_ids):
+        # Only messages from the RPG bots (and their edits) are routed to check_rpg_events
+        for bot_id in bot_ids:
+            self.bot.router.add_author(self, bot_id, self.check_rpg_events, edits=True)
+
+    @commands.Cog.listener()
+    async def on_config_compiled(self, compiled, old):
+        if old is not None and compiled.bot_ids == old.bot_ids:
+            return
+        # This cog only has author routes, so dropping them all is safe
+        self.bot.router.remove_owner(self)
+        self.register_bot_routes(compiled.bot_ids)
+
+    @commands.Cog.listener()
+    async def on_data_reloaded(self, diff):
+        # Only the squadrons that changed need their expiry timers resynced
+        now = time.time()
+        for channel_id, squad in diff.removed.items():
+            for event_type in squad.active_events:
+                self.expiry_wheel.cancel((channel_id, event_type))
+        for channel_id, (before, squad) in diff.changed.items():
+            for event_type in set(before.active_events) - set(squad.active_events):
+                self.expiry_wheel.cancel((channel_id, event_type))
+        touched = list(diff.added.items()) + [(cid, squad) for cid, (_, squad) in diff.changed.items()]
+        for channel_id, squad in touched:
+            for event_type in squad.active_events:
+                deadline = squad.event_deadlines.setdefault(event_type, now + EVENT_EXPIRY)
+                self.expiry_wheel.add((channel_id, event_type), deadline)
+
+    async def cog_unload(self):
+        self.bot.router.remove_owner(self)
+        self.expire_events.cancel()
+        self.rollup_history.cancel()
+        self.history.save(HISTORY_FILE)
+
+    @tasks.loop(hours=1)
+    async def rollup_history(self):
+        self.history.rollup()
+        # Snapshot on the loop so record() can't change the columns mid-copy, only the file write is threaded
+        payload = self.history.to_dict()
+        await asyncio.to_thread(EventHistory.write, HISTORY_FILE, payload)
+
+    @tasks.loop(seconds=1)
+    async def expire_events(self):
+        expired = self.expiry_wheel.advance(time.time())
+        if not expired:
+            return
+
+        by_channel = {}
+        for channel_id, event_type in expired:
+            by_channel.setdefault(channel_id, []).append(event_type)
+        results = await asyncio.gather(
+            *(self.expire_channel(channel_id, events) for channel_id, events in by_channel.items()),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"⚠️ Event expiry failed: {result}")
+
+    @expire_events.before_loop
+    async def before_expire_events(self):
+        await self.bot.wait_until_ready()
+
+    async def expire_channel(self, channel_id, events):
+        """Ends events that never got their end message (deleted message, missed edit, restart)."""
+        channel = self.bot.get_channel(channel_id)
+        async with self.bot.channel_queues.hold(channel_id):
+            squad = self.data.squadrons.get(channel_id)
+            if squad is None:
+                return
+            for event_type in events:
+                # ?clearactive or a real end message may already have removed it
+                if event_type in squad.active_events:
+                    print(f"⏰ {event_type.upper()} in {channel_id} expired without an end message.")
+                    self.history.record(channel_id, event_type, ending=True)
+                    if channel:
+                        await self.end_event(channel, squad, event_type)
+                    else:
+                        self.stop_tracking(channel_id, squad, event_type)
+
+    def start_tracking(self, channel_id, squad, event_type):
+        if event_type not in squad.active_events:
+            squad.active_events.append(event_type)
+        squad.event_deadlines[event_type] = time.time() + EVENT_EXPIRY
+        self.expiry_wheel.add((channel_id, event_type), squad.event_deadlines[event_type])
+        self.bot.save_squad(channel_id)
+
+    def stop_tracking(self, channel_id, squad, event_type):
+        if event_type in squad.active_events:
+            squad.active_events.remove(event_type)
+        squad.event_deadlines.pop(event_type, None)
+        self.expiry_wheel.cancel((channel_id, event_type))
+        self.bot.save_squad(channel_id)
 
     def get_role_ping(self, event_type):
-        """Pulls the role ID from the JSON config."""
-        roles = self.data.get("server_configs", {}).get("global", {}).get("roles", {})
-        role_id = roles.get(event_type)
-        return f"<@&{role_id}>" if role_id else "@everyone"
+        """Role mention for the event, precomputed in the compiled config."""
+        return self.bot.compiled_config.role_ping(event_type)
 
     def get_event_config(self, event_type):
-        configs = self.data.get("server_configs", {}).get("global", {}).get("event_configs", {})
-        event_cfg = configs.get(event_type)
-        if event_cfg:
-            return event_cfg['msg']
-        return f"⚠️ {event_type.upper()} started!"
+        return self.bot.compiled_config.event_message(event_type)
 
     async def check_rpg_events(self, message):
-        cfg = self.data.get("server_configs", {}).get("global", {})
-        if message.author.id not in [cfg.get("EPIC_RPG_ID"), cfg.get("IDLE_FARM_ID")]:
+        if message.author.id not in self.bot.compiled_config.bot_ids:
             return
 
         event_type, is_starting, is_ending = self.parse_buttons(message)
         if not event_type: return
 
-        now = time.time()
-        chan_id_str = str(message.channel.id)
-        chan_ev_key = f"{chan_id_str}_{event_type}"
+        # Start/end handling and manual ?hide/?unhide/?clearactive for one channel run in order
+        async with self.bot.channel_queues.hold(message.channel.id):
+            await self.apply_event(message, event_type, is_starting, is_ending)
 
+    def first_time(self, message, phase, event_type, window):
+        """True only the first time this message starts/ends the event."""
+        if not self.handled_events.add((message.id, phase, event_type)):
+            return False
+        return self.handled_events.add((message.channel.id, phase, event_type), ttl=window)
+
+    async def apply_event(self, message, event_type, is_starting, is_ending):
         # 1. Get the squad data safely
-        squads = self.data.get("squadrons", {})
-        squad = squads.get(chan_id_str)
+        squad = self.data.squadrons.get(message.channel.id)
 
         # --- PHASE 1: EVENT START ---
         if is_starting:
-            if (now - self.last_event_time.get(f"start_{chan_ev_key}", 0)) < 4: return
-            self.last_event_time[f"start_{chan_ev_key}"] = now
+            if not self.first_time(message, "start", event_type, window=4): return
+            self.history.record(message.channel.id, event_type, ending=False)
 
             # Only track active_events and do unhide logic IF the squad exists
             if squad is not None:
-                if "active_events" not in squad: 
-                    squad["active_events"] = []
-                
-                if event_type not in squad["active_events"]:
-                    squad["active_events"].append(event_type)
-                    self.save_data(self.data)
+                self.start_tracking(message.channel.id, squad, event_type)
 
                 # UNHIDE LOGIC (Only runs if it's a squad channel)
-                if squad.get("events_enabled", True) and not squad.get("squad_only_mode", False):
+                if squad.events_enabled and not squad.squad_only_mode:
                     manager = self.bot.get_cog("SquadronManager")
                     if manager:
                         await manager.update_permissions(message.channel, hide=False)
 
             # Announce the event
             custom_msg = self.get_event_config(event_type)
-            await message.channel.send(f"{custom_msg}")
+            await self.bot.rest.run(
+                f"send:{message.channel.id}", lambda: message.channel.send(f"{custom_msg}"), priority=PRIORITY_EVENT
+            )
 
         # 2. End logic
         elif is_ending:
-            if (now - self.last_event_time.get(f"end_{chan_ev_key}", 0)) < 2: return
-            self.last_event_time[f"end_{chan_ev_key}"] = now
+            if not self.first_time(message, "end", event_type, window=2): return
+            self.history.record(message.channel.id, event_type, ending=True)
 
             # If it's a squadron, manage the active_events list and hiding
             if squad is not None:
-                if "active_events" in squad and event_type in squad["active_events"]:
-                    squad["active_events"].remove(event_type)
-                    self.save_data(self.data)
-                # Logic for hiding when ALL events are over
-                if len(squad.get("active_events", [])) == 0:
-                    is_manual_hidden = squad.get("is_hidden", True)
+                await self.end_event(message.channel, squad, event_type)
+
+    async def end_event(self, channel, squad, event_type):
+        """Removes the event and hides the channel once no events are left."""
+        self.stop_tracking(channel.id, squad, event_type)
+
+        # Logic for hiding when ALL events are over
+        if len(squad.active_events) == 0:
+            is_manual_hidden = squad.is_hidden
+            
+            if is_manual_hidden:
+                manager = self.bot.get_cog("SquadronManager")
+                if manager:
+                    # --- CHECK IF UNHIDE ACTUALLY HAPPENED ---
+                    # We only send the message if the channel is currently visible
+                    # The cache may not show our own last unhide yet, the manager remembers it
+                    overwrite = manager.overwrites.current(channel).get(channel.guild.default_role)
+                    was_visible = overwrite is not None and overwrite.view_channel is True
+
+                    await manager.update_permissions(channel, hide=True)
                     
-                    if is_manual_hidden:
-                        if squad.get("is_hidden", True):
-                            manager = self.bot.get_cog("SquadronManager")
-                            if manager:
-                                # --- CHECK IF UNHIDE ACTUALLY HAPPENED ---
-                                # We only send the message if the channel is currently visible
-                                overwrites = message.channel.overwrites_for(message.guild.default_role)
-                                was_visible = overwrites.view_channel is True
-
-                                await manager.update_permissions(message.channel, hide=True)
-                                
-                                # Only announce if it was actually visible to prevent spam
-                                if was_visible:
-                                    await message.channel.send(f"🔒 **{event_type.upper()} ended. Channel has been hidden.**")
+                    # Only announce if it was actually visible to prevent spam
+                    if was_visible:
+                        await self.bot.rest.run(
+                            f"send:{channel.id}",
+                            lambda: channel.send(f"🔒 **{event_type.upper()} ended. Channel has been hidden.**"),
+                            priority=PRIORITY_EVENT
+                        )
+
+    @commands.command()
+    @commands.has_permissions(manage_channels=True)
+    async def eventstats(self, ctx, channel: Optional[discord.TextChannel] = None, window: str = "7d"):
+        """Event counts, average duration and busiest hours. Usage: ?eventstats [#channel] [24h/7d/30d/all]"""
+        match = re.fullmatch(r"(\d+)([hd])", window.lower())
+        if window.lower() == "all":
+            seconds = None
+        elif match:
+            seconds = int(match.group(1)) * (3600 if match.group(2) == "h" else 86400)
+        else:
+            return await ctx.send("❓ Invalid window! Use something like `24h`, `7d` or `all`.")
+
+        stats = self.history.stats(channel.id if channel else None, seconds)
+        if not stats["counts"]:
+            return await ctx.send("📭 No events recorded in that window.")
+
+        scope = channel.mention if channel else "all channels"
+        embed = discord.Embed(
+            title="📊 Event Statistics",
+            description=f"Events in {scope} over the last **{window}**",
+            color=discord.Color.purple()
+        )
+        lines = []
+        for event, count in sorted(stats["counts"].items(), key=lambda item: item[1], reverse=True):
+            avg = stats["avg_duration"].get(event)
+            avg_text = f" — avg {avg:.0f}s" if avg else ""
+            lines.append(f"**{event.upper()}**: {count}{avg_text}")
+        embed.add_field(name="🔥 Events", value="\n".join(lines), inline=False)
+
+        busiest = ", ".join(f"{hour:02d}:00 ({count})" for hour, count in stats["busiest_hours"])
+        embed.add_field(name="⏰ Busiest Hours (UTC)", value=busiest or "None", inline=False)
+        await ctx.send(embed=embed)
 
     def parse_buttons(self, message):
         """Detects event type and status via buttons, matching JSON keys."""
         if not message.components:
             return None, False, False
-        
-        for row in message.components:
-            for btn in row.children:
-                if isinstance(btn, discord.Button):
-                    lbl = btn.label.upper() if btn.label else ""
-                    
-                    event = None
-                    # Match these EXACTLY to your JSON keys
-                    if lbl == "JOIN":
-                        # Check if it's Miniboss/Idlons vs Arena
-                        emo = str(btn.emoji).lower() if btn.emoji else ""
-                        if "swords" in emo: event = "arena"
-                        elif "idlons" in emo: event = "lucky rewards" # Matches JSON
-                        elif "dagger" in emo: event = "miniboss" # Fallback for IDLONS join
-                    elif lbl == "PACK": event = "pack"
-                    elif lbl == "OHMMM": event = "ohmmm"
-                    elif lbl == "SUMMON": event = "summon"
-                    elif lbl == "TIME TO FIGHT": event = "boss"
-                    elif lbl == "LETS GET THAT PICKAXE": event = "pickaxe"
-                    elif lbl == "CATCH": event = "catch"
-                    elif lbl == "CUT": event = "cut"
-                    elif lbl == "LURE": event = "lure" # Fixed (was fish)
-
-                    if event:
-                        # Return: event_name, is_starting, is_ending
-                        return event, not btn.disabled, btn.disabled
+
+        buttons = [btn for row in message.components for btn in row.children if isinstance(btn, discord.Button)]
+        # Button presses edit the message in place, so an unchanged message is answered from the memo
+        fingerprint = tuple((btn.label, btn.emoji.name if btn.emoji else None, btn.disabled) for btn in buttons)
+        key = (message.id, fingerprint)
+        result = self.button_memo.get(key)
+        if result is None:
+            result = self.classify_buttons(buttons)
+            self.button_memo[key] = result
+        return result
+
+    def classify_buttons(self, buttons):
+        for btn in buttons:
+            candidates = self.button_table.get(btn.label.upper() if btn.label else "")
+            if not candidates:
+                continue
+
+            emo = str(btn.emoji).lower() if btn.emoji else ""
+            for token, event in candidates:
+                if token is None or token in emo:
+                    # Return: event_name, is_starting, is_ending
+                    return event, not btn.disabled, btn.disabled
         return None, False, False
     
 async def setup(bot):
@@ -1,9 +1,18 @@
 import discord
 from discord.ext import commands
+from utils.cache import RenderCache
+
+# The help command object is copied for every invocation, so the cache lives at module level.
+# Keyed by prefix, the menu text never changes otherwise.
+_help_embeds = RenderCache(maxsize=8)
 
 class CustomHelp(commands.HelpCommand):
     async def send_bot_help(self, mapping):
         prefix = self.context.clean_prefix
+        embed = _help_embeds.render(prefix, 0, lambda: self.render_bot_help(prefix))
+        await self.get_destination().send(embed=embed)
+
+    def render_bot_help(self, prefix):
         embed = discord.Embed(
             title="🛠️ Squadron Bot Help Menu",
             description=f"Use `{prefix}help [command]` for more details.",
@@ -34,7 +43,7 @@ class CustomHelp(commands.HelpCommand):
         embed.add_field(name="⚙️ Event Settings", value=settings, inline=False)
 
         embed.set_footer(text="Developed for ERPG Squadron Management")
-        await self.get_destination().send(embed=embed)
+        return embed
 
     # This runs for ?help [command]
     async def send_command_help(self, command):
@@ -1,9 +1,26 @@
 import discord
 from discord.ext import commands
+from utils.dispatch import dispatch
+from utils.rest import PRIORITY_EVENT, PRIORITY_PERMISSIONS, PRIORITY_TRADE
+
+def message_fingerprint(message):
+    """The parts of a message EventTracker and Trades actually read."""
+    components = tuple(
+        (getattr(btn, "label", None), str(getattr(btn, "emoji", None)), getattr(btn, "disabled", None))
+        for row in message.components for btn in getattr(row, "children", ())
+    )
+    embeds = tuple(
+        (embed.author.name, embed.author.icon_url, embed.title, embed.description,
+         tuple((f.name, f.value) for f in embed.fields))
+        for embed in message.embeds
+    )
+    return message.content, components, embeds
 
 class GlobalListeners(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Counters for on_message_edit, shown by ?editstats
+        self.edit_stats = {"seen": 0, "unrouted": 0, "skipped": 0, "dispatched": 0}
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -11,31 +28,54 @@ class GlobalListeners(commands.Cog):
         if message.author == self.bot.user:
             return
 
-        # 2. Forward to Event Tracker (cogs/events.py)
-        event_cog = self.bot.get_cog("EventTracker")
-        if event_cog:
-            await event_cog.check_rpg_events(message)
-
-        # Inside GlobalListeners on_message
-        trade_cog = self.bot.get_cog("Trades") # 'Trades' is the class name in check_trades.py
-        if trade_cog:
-            await trade_cog.process_trade_logic(message)
-            
-            # Inside GlobalListeners on_message
-        calc_cog = self.bot.get_cog("Calculator") 
-        if calc_cog:
-            await calc_cog.process_calculator_logic(message)
+        # 2. Only the cogs that registered for this author/channel/prefix get the message
+        #    (EventTracker, Trades and Calculator register their routes in cog_load)
+        # 3. Handlers run concurrently, one failing or hanging doesn't affect the others
+        await dispatch(self.bot.router.route(message), message)
 
     @commands.Cog.listener()
     async def on_message_edit(self, before, after):
         # Buttons on Epic RPG messages update the message rather than sending a new one
-        event_cog = self.bot.get_cog("EventTracker")
-        if event_cog:
-            await event_cog.check_rpg_events(after)
-            
-        trade_cog = self.bot.get_cog("Trades")
-        if trade_cog:
-            await trade_cog.process_trade_logic(after)
+        self.edit_stats["seen"] += 1
+        handlers = self.bot.router.route(after, edit=True)
+        if not handlers:
+            self.edit_stats["unrouted"] += 1
+            return
+
+        # Embed unfurls and other edits that leave everything we read unchanged are skipped
+        if message_fingerprint(before) == message_fingerprint(after):
+            self.edit_stats["skipped"] += 1
+            return
+
+        self.edit_stats["dispatched"] += 1
+        await dispatch(handlers, after)
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def editstats(self, ctx):
+        """Shows how many message edits were skipped by the edit filter."""
+        stats = self.edit_stats
+        await ctx.send(
+            f"✏️ **Edits seen:** {stats['seen']}\n"
+            f"🚫 **Not routed:** {stats['unrouted']}\n"
+            f"⏭️ **Unchanged (skipped):** {stats['skipped']}\n"
+            f"📨 **Dispatched:** {stats['dispatched']}"
+        )
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def reststats(self, ctx):
+        """Shows queue depth and wait times of the REST scheduler."""
+        rest = self.bot.rest
+        waits = "\n".join(
+            f"**{name}:** {rest.average_wait(priority) * 1000:.0f} ms avg"
+            for name, priority in (("Events", PRIORITY_EVENT), ("Permissions", PRIORITY_PERMISSIONS), ("Trades", PRIORITY_TRADE))
+        )
+        await ctx.send(
+            f"📬 **Queue depth:** {rest.depth} (max {rest.max_depth})\n"
+            f"✅ **Executed:** {rest.executed} | 🔁 **Coalesced:** {rest.superseded} | ❌ **Failed:** {rest.failed}\n"
+            f"{waits}"
+        )
 
 async def setup(bot):
     await bot.add_cog(GlobalListeners(bot))
\ No newline at end of file
@@ -1,21 +1,121 @@
+import asyncio
+import math
+import os
+import time
+from typing import Optional
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+from utils.bulk import BulkJob, run_bulk
+from utils.cache import LRUCache, RenderCache
+from utils.models import Squadron
+from utils.permissions import OverwriteTracker, apply_overwrites, plan_overwrites
+from utils.rest import PRIORITY_BULK, PRIORITY_PERMISSIONS
+
+BULK_FILE = "bulk_job.json"
+# Channels worked on at the same time by a bulk job, the REST scheduler does the actual rate limiting
+BULK_CONCURRENCY = 5
+BULK_ACTIONS = ("move", "hide", "unhide", "reconcile")
+# Squadrons per ?viewsquadrons page, keeps the embed well under the 4096 character limit
+PAGE_SIZE = 20
+
+class SquadronListView(discord.ui.View):
+    """Paginated ?viewsquadrons. Pages are rendered only when shown, by SquadronManager.render_page."""
+
+    def __init__(self, manager, author_id, owner_id=None, active_only=False):
+        super().__init__(timeout=180)
+        self.manager = manager
+        self.author_id = author_id
+        self.owner_id = owner_id
+        self.active_only = active_only
+        self.page = 0
+        self.message = None
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ This list belongs to someone else.", ephemeral=True)
+            return False
+        return True
+
+    def current_embed(self):
+        embed, pages = self.manager.render_page(self.owner_id, self.active_only, self.page)
+        # The data may have shrunk since the last click
+        if self.page >= pages:
+            self.page = pages - 1
+            embed, pages = self.manager.render_page(self.owner_id, self.active_only, self.page)
+        self.prev_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+        return embed
+
+    async def show(self, interaction):
+        await interaction.response.edit_message(embed=self.current_embed(), view=self)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction, button):
+        self.page = max(self.page - 1, 0)
+        await self.show(interaction)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        self.page += 1
+        await self.show(interaction)
+
+    @discord.ui.select(
+        placeholder="Filter squadrons...",
+        options=[
+            discord.SelectOption(label="All squadrons", value="all", emoji="📂"),
+            discord.SelectOption(label="With active events", value="active", emoji="🔥"),
+        ]
+    )
+    async def filter_select(self, interaction, select):
+        self.active_only = select.values[0] == "active"
+        self.page = 0
+        await self.show(interaction)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
 
 class SquadronManager(commands.Cog):
     def __init__(self, bot, data, save_func):
         self.bot = bot
         self.data = data
         self.save_data = save_func
+        # The running ?bulk job, if any
+        self.bulk_task = None
+        # (data version, owner, active only) -> channel IDs, and (... , page) -> embed
+        self.list_cache = LRUCache(maxsize=16)
+        self.page_cache = LRUCache(maxsize=64)
+        # channel ID -> (squad version, showlist embed)
+        self.embed_cache = RenderCache(maxsize=256)
+        self.reconcile_lock = asyncio.Lock()
+        # Overwrites we applied that the gateway cache may not show yet
+        self.overwrites = OverwriteTracker()
+
+    async def cog_load(self):
+        self.compact_members.start()
+
+    async def cog_unload(self):
+        self.compact_members.cancel()
+        # The job file keeps whatever is left, ?bulk resume picks it up again
+        if self.bulk_task and not self.bulk_task.done():
+            self.bulk_task.cancel()
+            # Lets its final checkpoint run while the REST scheduler is still up
+            await asyncio.gather(self.bulk_task, return_exceptions=True)
 
     # --- PERMISSIONS HELPER ---
-    async def update_permissions(self, channel, hide=True):
-        squad = self.data["squadrons"].get(str(channel.id))
-        if not squad: return
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.bot.auth.forget_guild(role.guild.id)
 
-        # Pull IDs from your updated JSON
-        cfg = self.data.get("server_configs", {}).get("global", {})
-        rpg_role_id = cfg.get("EPIC_RPG_ROLE_ID")
-        mod_role_id = cfg.get("MODERATOR_ROLE_ID")
+    def desired_overwrites(self, channel, squad, hide):
+        """The full overwrite set a squadron channel should have."""
+        compiled = self.bot.compiled_config
+        guild = channel.guild
 
         overwrites = {
             channel.guild.default_role: discord.PermissionOverwrite(view_channel=not hide),
@@ -23,88 +123,213 @@ class SquadronManager(commands.Cog):
         }
 
         # 1. Always allow EPIC RPG BOT Role
-        if rpg_role_id:
-            rpg_role = channel.guild.get_role(int(rpg_role_id))
-            if rpg_role: 
-                overwrites[rpg_role] = discord.PermissionOverwrite(view_channel=True, send_messages=True)
+        rpg_role = guild.get_role(compiled.rpg_role_id) if compiled.rpg_role_id else None
+        if rpg_role: 
+            overwrites[rpg_role] = discord.PermissionOverwrite(view_channel=True, send_messages=True)
 
         # 2. Always allow Moderators
-        if mod_role_id:
-            mod_role = channel.guild.get_role(int(mod_role_id))
-            if mod_role: 
-                overwrites[mod_role] = discord.PermissionOverwrite(view_channel=True)
+        mod_role = guild.get_role(compiled.moderator_role_id) if compiled.moderator_role_id else None
+        if mod_role: 
+            overwrites[mod_role] = discord.PermissionOverwrite(view_channel=True)
 
         # 3. Allow Owner and Members
-        all_uids = [squad["owner_id"]] + squad["members"]
+        all_uids = [squad.owner_id] + squad.members
+        unresolved = []
         for uid in all_uids:
-            member = channel.guild.get_member(int(uid))
+            member = channel.guild.get_member(uid)
             if member: overwrites[member] = discord.PermissionOverwrite(view_channel=True)
+            else: unresolved.append(uid)
 
-        await channel.edit(overwrites=overwrites)
+        # A member missing from a half-loaded member list keeps whatever access they have now
+        if unresolved:
+            current = {target.id: (target, overwrite) for target, overwrite in self.overwrites.current(channel).items()}
+            for uid in unresolved:
+                if uid in current:
+                    target, overwrite = current[uid]
+                    overwrites[target] = overwrite
 
-    def is_mod_or_owner(self, ctx, squad):
-        """Helper to check if user is a Mod or the Squad Owner"""
-        is_owner = squad["owner_id"] == ctx.author.id
-        # Checks for Manage Channels permission OR the Mod Role ID from JSON
-        mod_role_id = self.data.get("server_configs", {}).get("global", {}).get("MODERATOR_ROLE_ID")
-        is_mod = ctx.author.guild_permissions.manage_channels or any(r.id == mod_role_id for r in ctx.author.roles)
-        return is_owner or is_mod
-    
-    async def get_squad_embed(self, channel_id):
-        """Helper to build the showlist embed with the new footer."""
-        squad = self.data["squadrons"].get(str(channel_id))
-        if not squad: return None
+        return overwrites
 
-        owner = f"<@{squad['owner_id']}> (Owner)"
-        members = "\n".join([f"<@{uid}>" for uid in squad["members"]]) if squad["members"] else "None"
-        
-        event_status = "✅ Enabled" if squad.get("events_enabled", True) else "❌ Disabled"
-        squad_only = "🔒 ON (Always Hidden)" if squad.get("squad_only_mode", False) else "🔓 OFF (Default)"
+    async def update_permissions(self, channel, hide=True, priority=PRIORITY_PERMISSIONS):
+        squad = self.data.squadrons.get(channel.id)
+        if not squad: return
 
-        embed = discord.Embed(
-            title="👥 Squadron Information", 
-            description=f"Settings and members for <#{channel_id}>",
-            color=discord.Color.blue()
+        async def apply():
+            # Built when the call actually runs, so a superseded hide/unhide never gets applied
+            squad = self.data.squadrons.get(channel.id)
+            if not squad: return 0
+            # hide=None follows the stored state as it is at that moment
+            hidden = self.expected_hidden(squad) if hide is None else hide
+            # Skips the REST call when nothing changed and uses set_permissions when only one target did
+            return await apply_overwrites(channel, self.desired_overwrites(channel, squad, hidden), tracker=self.overwrites)
+
+        # Queued visibility changes for the same channel replace each other
+        return await self.bot.rest.run(
+            f"perms:{channel.id}", apply, priority=priority, key=("visibility", channel.id)
         )
-        embed.add_field(name="🔔 Event Unhide", value=event_status, inline=True)
-        embed.add_field(name="🛡️ Squad-Only Mode", value=squad_only, inline=True)
-        embed.add_field(name="⭐ Owner", value=owner, inline=False)
-        embed.add_field(name="Members", value=members, inline=False)
-        
-        active = ", ".join(squad.get("active_events", []))
-        if active:
-            embed.add_field(name="🔥 Active Events", value=active.upper(), inline=False)
 
-        # Quality change: Added the requested footer
-        prefix = self.bot.command_prefix
-        # If prefix is a list or callable, we just pick the first character or use '?'
-        display_prefix = prefix[0] if isinstance(prefix, (list, tuple)) else prefix
-        embed.set_footer(text=f"For more information use {display_prefix}help")
-        
-        return embed
+    @staticmethod
+    def expected_hidden(squad, now=None):
+        """Whether the channel should currently be hidden, given its stored state."""
+        now = now if now is not None else time.time()
+        # Events past their deadline ended while nobody was watching, the expiry loop cleans them up
+        live_events = [e for e in squad.active_events if squad.event_deadlines.get(e, now + 1) > now]
+        if live_events and squad.events_enabled and not squad.squad_only_mode:
+            return False
+        return squad.is_hidden or squad.squad_only_mode
+
+    # --- EVICTION ---
+    def evict_squad(self, channel_id):
+        """Drops a squadron from the data and the index. Returns False if it wasn't registered."""
+        squad = self.data.squadrons.pop(channel_id, None)
+        if squad is None:
+            return False
+        self.bot.squad_index.remove_squad(channel_id, squad)
+        # A missing squadron is deleted by the store
+        self.bot.save_squad(channel_id)
+        return True
+
+    def drop_member(self, channel_id, squad, user_id):
+        if user_id in squad.members:
+            squad.members.remove(user_id)
+            self.bot.squad_index.remove_member(channel_id, user_id)
+            self.bot.save_squad(channel_id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        self.overwrites.seen(after)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.overwrites.forget(channel.id)
+        if self.evict_squad(channel.id):
+            print(f"🗑️ Squadron channel {channel.name} ({channel.id}) was deleted, removed it from the data.")
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        evicted = [channel.id for channel in guild.channels if self.evict_squad(channel.id)]
+        if evicted:
+            print(f"🗑️ Left {guild.name}, removed {len(evicted)} squadrons.")
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.bot.auth.forget_member(member.guild.id, member.id)
+        for channel_id in list(self.bot.squad_index.squads_for(member.id)):
+            squad = self.data.squadrons.get(channel_id)
+            if squad is None:
+                continue
+            if squad.owner_id == member.id:
+                # Ownership is left for a mod to hand over with ?transferowner
+                print(f"⚠️ Owner of squadron {channel_id} ({member}) left the server.")
+            else:
+                self.drop_member(channel_id, squad, member.id)
+
+    @tasks.loop(hours=6)
+    async def compact_members(self):
+        """Drops members who left while the bot was offline (on_member_remove covers the rest)."""
+        removed = 0
+        for channel_id, squad in list(self.data.squadrons.items()):
+            channel = self.bot.get_channel(channel_id)
+            # Without a full member list get_member can't tell "left" from "not cached"
+            if channel is None or not channel.guild.chunked:
+                continue
+            for uid in [uid for uid in squad.members if channel.guild.get_member(uid) is None]:
+                self.drop_member(channel_id, squad, uid)
+                removed += 1
+        if removed:
+            print(f"🧹 Compacted squadrons: removed {removed} departed members.")
+
+    @compact_members.before_loop
+    async def before_compact_members(self):
+        await self.bot.wait_until_ready()
+
+    # --- STARTUP RECONCILIATION ---
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # on_ready fires again after reconnects, which is exactly when things may have drifted
+        if self.reconcile_lock.locked():
+            return
+        async with self.reconcile_lock:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"⚠️ Startup reconciliation failed: {e}")
+
+    async def reconcile(self):
+        """Fixes squadron channels whose overwrites don't match the stored state.
+
+        The scan only reads cached overwrites (ours where the gateway hasn't
+        caught up yet), so it costs no REST calls. The channels that differ are then fixed as one bulk job that
+        goes through the REST scheduler, and squadrons whose channel is gone
+        are dropped. Guilds whose member list is still loading are left alone.
+        """
+        started = time.monotonic()
+        now = time.time()
+        drifted, missing = [], []
+        unchecked = 0
+        for i, (channel_id, squad) in enumerate(list(self.data.squadrons.items())):
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                missing.append(channel_id)
+            elif not channel.guild.chunked:
+                # Members that aren't cached yet would look like drift, ?bulk reconcile catches these up later
+                unchecked += 1
+            elif plan_overwrites(self.overwrites.current(channel), self.desired_overwrites(channel, squad, self.expected_hidden(squad, now))):
+                drifted.append(channel_id)
+            if i % 100 == 99:
+                # Hundreds of channels shouldn't hold up the gateway
+                await asyncio.sleep(0)
+
+        # A guild that is still unavailable or loading looks like missing channels, so nothing is pruned then
+        pruned = []
+        ready = all(not guild.unavailable and guild.chunked for guild in self.bot.guilds)
+        if missing and self.bot.guilds and ready:
+            pruned = [channel_id for channel_id in missing if self.evict_squad(channel_id)]
+
+        job = BulkJob("reconcile", drifted)
+        if drifted:
+            await run_bulk(job, lambda cid: self.bulk_reconcile(job, cid), BULK_CONCURRENCY)
+
+        print(
+            f"🔁 Reconciled {len(self.data.squadrons)} squadrons in {time.monotonic() - started:.1f}s: "
+            f"{job.done} fixed, {len(job.failed)} failed, {len(pruned)} pruned"
+        )
+        if unchecked:
+            print(f"⚠️ Skipped {unchecked} squadrons in guilds whose member list hasn't loaded yet.")
+        if pruned:
+            print(f"🗑️ Pruned squadrons with deleted channels: {', '.join(map(str, pruned))}")
+        return job, pruned
+
+    def is_mod(self, ctx):
+        """Manage Channels, guild owner or the Mod Role from the config (cached per member)"""
+        return self.bot.auth.is_mod(ctx.author, self.bot.compiled_config)
 
+    def is_mod_or_owner(self, ctx, squad):
+        """Helper to check if user is a Mod or the Squad Owner"""
+        return self.bot.auth.is_mod_or_owner(ctx.author, squad, self.bot.compiled_config)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            self.bot.auth.forget_member(after.guild.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        if before.permissions != after.permissions:
+            self.bot.auth.forget_guild(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before, after):
+        if before.owner_id != after.owner_id:
+            self.bot.auth.forget_guild(after.id)
+    
     # --- COMMANDS ---
 
     @commands.command(name="squad", aliases=["mysquads"])
     async def squad(self, ctx):
         """Tells the user which squadron channel they belong to with clickable links."""
-        user_id = ctx.author.id
-        found_squads = []
-
-        # Access the squadrons dictionary from your data
-        squads = self.data.get("squadrons", {})
-
-        # Search through all saved squadrons
-        # k is the channel_id, v is the squad data dictionary
-        for channel_id, squad_info in squads.items():
-            owner_id = squad_info.get("owner_id")
-            members = squad_info.get("members", [])
-
-            # Check if user is owner or in the member list
-            # We convert to int just in case they are stored as strings in JSON
-            if int(owner_id) == user_id or any(int(m) == user_id for m in members):
-                # Format as <#ID> to make it a clickable blue link
-                found_squads.append(f"<#{channel_id}>")
+        # Reverse index lookup instead of scanning every squadron
+        found_squads = [f"<#{channel_id}>" for channel_id in self.bot.squad_index.squads_for(ctx.author.id)]
 
         if found_squads:
             channels_str = ", ".join(found_squads)
@@ -112,58 +337,178 @@ class SquadronManager(commands.Cog):
         else:
             await ctx.send(f"❌ {ctx.author.mention}, you aren't in any squadrons yet.")
 
-    @commands.command(hidden=True)
-    async def viewsquadrons(self, ctx):
-        """Moderator only: Lists all active squadron channels."""
-        # Permission Check
-        mod_role_id = self.data.get("server_configs", {}).get("global", {}).get("MODERATOR_ROLE_ID")
-        is_mod = ctx.author.guild_permissions.manage_channels or any(r.id == mod_role_id for r in ctx.author.roles)
-        
-        if not is_mod and ctx.author.id != ctx.guild.owner_id:
-            return await ctx.send("❌ This command is restricted to the Developer Team and Moderators.")
-
-        if not self.data["squadrons"]:
-            return await ctx.send("📂 No squadrons have been created yet.")
+    def filtered_squads(self, owner_id, active_only):
+        key = (self.bot.data_version, owner_id, active_only)
+        channel_ids = self.list_cache.get(key)
+        if channel_ids is None:
+            if owner_id is not None:
+                # Reverse index instead of scanning every squadron for one owner
+                owned = self.bot.squad_index.owned_by(owner_id)
+                candidates = [owned] if owned is not None else []
+            else:
+                candidates = list(self.data.squadrons)
+            channel_ids = [
+                cid for cid in candidates
+                if cid in self.data.squadrons and (not active_only or self.data.squadrons[cid].active_events)
+            ]
+            self.list_cache[key] = channel_ids
+        return channel_ids
+
+    def render_page(self, owner_id, active_only, page):
+        """Returns (embed, page count). Rendered pages are reused until the data changes."""
+        channel_ids = self.filtered_squads(owner_id, active_only)
+        pages = max(math.ceil(len(channel_ids) / PAGE_SIZE), 1)
+        page = min(page, pages - 1)
+        key = (self.bot.data_version, owner_id, active_only, page)
+        embed = self.page_cache.get(key)
+        if embed is not None:
+            return embed, pages
 
-        # Build the list of links
         squad_list = []
-        for channel_id, info in self.data["squadrons"].items():
-            owner = f"<@{info['owner_id']}>"
-            squad_list.append(f"• <#{channel_id}> — Owner: {owner}")
+        for channel_id in channel_ids[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]:
+            info = self.data.squadrons[channel_id]
+            active = f" — 🔥 {', '.join(info.active_events).upper()}" if info.active_events else ""
+            squad_list.append(f"• <#{channel_id}> — Owner: <@{info.owner_id}>{active}")
+
+        filters = []
+        if owner_id is not None:
+            filters.append(f"owner <@{owner_id}>")
+        if active_only:
+            filters.append("active events")
+        description = "\n".join(squad_list) or "📂 No squadrons match this filter."
+        if filters:
+            description = f"Filtered by {' and '.join(filters)}\n\n{description}"
 
-        # Split into multiple embeds if the list is huge (Discord limit)
         embed = discord.Embed(
             title="🛡️ Moderator Oversight: Active Squadrons",
-            description="\n".join(squad_list),
+            description=description,
             color=discord.Color.dark_red()
         )
-        embed.set_footer(text=f"Total Squadrons: {len(self.data['squadrons'])}")
-        await ctx.send(embed=embed)
+        embed.set_footer(text=f"Page {page + 1}/{pages} | Showing {len(channel_ids)} of {len(self.data.squadrons)} squadrons")
+        self.page_cache[key] = embed
+        return embed, pages
+
+    @commands.command(hidden=True)
+    async def viewsquadrons(self, ctx, owner: Optional[discord.Member] = None, mode: str = "all"):
+        """Moderator only: Lists all squadron channels. Usage: ?viewsquadrons [@owner] [all/active]"""
+        # Permission Check
+        if not self.is_mod(ctx):
+            return await ctx.send("❌ This command is restricted to the Developer Team and Moderators.")
+
+        if not self.data.squadrons:
+            return await ctx.send("📂 No squadrons have been created yet.")
+
+        view = SquadronListView(self, ctx.author.id, owner.id if owner else None, mode.lower() == "active")
+        view.message = await ctx.send(embed=view.current_embed(), view=view)
 
     @commands.command(hidden=True)
     @commands.has_permissions(administrator=True)
     async def setcategory(self, ctx, category_id: int):
         """Updates the Private Battalions category ID in the config."""
         try:
-            # 1. Update the nested value in memory
-            self.bot.squad_data["server_configs"]["global"]["CATEGORY_ID"] = category_id
+            # 1. Update the value in memory
+            self.data.config.category_id = category_id
             
-            # 2. Save the updated dictionary back to squadrons_data.json
-            self.bot.save_data()
+            # 2. Save the updated config
+            self.bot.save_config()
             
-            await ctx.send(f"✅ **Category Updated!** All new squadrons will now be created in: `{category_id}`")
-        except KeyError:
-            await ctx.send("❌ Error: Could not find 'server_configs' or 'global' in your JSON structure.")
+            await ctx.send(
+                f"✅ **Category Updated!** All new squadrons will now be created in: `{category_id}`\n"
+                f"Use `{self.bot.command_prefix}bulk move` to move the existing squadrons there too."
+            )
         except Exception as e:
             await ctx.send(f"❌ An unexpected error occurred: `{e}`")
 
+    # --- BULK OPERATIONS ---
+    @commands.command(hidden=True)
+    @commands.has_permissions(administrator=True)
+    async def bulk(self, ctx, action: str):
+        """Runs move/hide/unhide/reconcile on every squadron. Usage: ?bulk <action|resume|cancel>"""
+        action = action.lower()
+        running = self.bulk_task is not None and not self.bulk_task.done()
+
+        if action == "cancel":
+            if not running:
+                return await ctx.send("❌ No bulk job is running.")
+            self.bulk_task.cancel()
+            return await ctx.send(f"🛑 Bulk job stopped. Use `{self.bot.command_prefix}bulk resume` to continue it.")
+
+        if running:
+            return await ctx.send("⏳ A bulk job is already running! Wait for it or use `?bulk cancel`.")
+
+        if action == "resume":
+            job = BulkJob.load(BULK_FILE)
+            if job is None or not job.pending:
+                return await ctx.send("📭 There is no unfinished bulk job to resume.")
+        elif action in BULK_ACTIONS:
+            job = BulkJob(action, list(self.data.squadrons))
+            if action == "move":
+                job.arg = self.data.config.category_id
+                if not isinstance(self.bot.get_channel(job.arg), discord.CategoryChannel):
+                    return await ctx.send("❌ The configured category doesn't exist. Set one with `?setcategory` first.")
+        else:
+            return await ctx.send(f"❓ Unknown action! Use one of: `{'`, `'.join(BULK_ACTIONS)}`, `resume` or `cancel`.")
+
+        status = await ctx.send(job.progress_text())
+        job.status = (status.channel.id, status.id)
+        job.save(BULK_FILE)
+        self.bulk_task = asyncio.create_task(self.run_bulk_job(job, status))
+
+    async def run_bulk_job(self, job, status):
+        async def on_progress(job, finished):
+            await self.bot.rest.run(
+                f"edit:{status.channel.id}", lambda: status.edit(content=job.progress_text(finished)), priority=PRIORITY_BULK
+            )
+
+        def checkpoint(job):
+            if job.pending:
+                job.save(BULK_FILE)
+            elif os.path.exists(BULK_FILE):
+                os.remove(BULK_FILE)
+
+        operation = {
+            "move": self.bulk_move,
+            "hide": self.bulk_visibility,
+            "unhide": self.bulk_visibility,
+            "reconcile": self.bulk_reconcile,
+        }[job.action]
+        await run_bulk(
+            job, lambda cid: operation(job, cid), BULK_CONCURRENCY, on_progress=on_progress, checkpoint=checkpoint
+        )
+
+    async def bulk_move(self, job, channel_id):
+        channel = self.bot.get_channel(channel_id)
+        category = self.bot.get_channel(job.arg)
+        if channel is None or category is None or channel.category_id == category.id:
+            return False
+        await self.bot.rest.run(f"edit:{channel_id}", lambda: channel.edit(category=category), priority=PRIORITY_BULK)
+
+    async def bulk_visibility(self, job, channel_id):
+        channel = self.bot.get_channel(channel_id)
+        squad = self.data.squadrons.get(channel_id)
+        if channel is None or squad is None:
+            return False
+        # Same as running ?hide / ?unhide in the channel
+        async with self.bot.channel_queues.hold(channel_id):
+            squad.is_hidden = job.action == "hide"
+            self.bot.save_squad(channel_id)
+        # The lock isn't held while the low priority call waits, an event in this channel
+        # would stall behind it. The call reads the state when it runs, and an event's own
+        # visibility change replaces it in the queue.
+        await self.update_permissions(channel, hide=None, priority=PRIORITY_BULK)
+
+    async def bulk_reconcile(self, job, channel_id):
+        channel = self.bot.get_channel(channel_id)
+        squad = self.data.squadrons.get(channel_id)
+        if channel is None or squad is None:
+            return False
+        # Rewrites the overwrites from the stored state, apply_overwrites skips channels that already match
+        await self.update_permissions(channel, hide=None, priority=PRIORITY_BULK)
+
     @commands.command(aliases=["modhelp"], hidden=True)
     async def devhelp(self, ctx):
         """Displays hidden commands for the Admin/Dev team."""
-        mod_role_id = self.data.get("server_configs", {}).get("global", {}).get("MODERATOR_ROLE_ID")
-        is_mod = ctx.author.guild_permissions.manage_channels or any(r.id == mod_role_id for r in ctx.author.roles)
-
-        if not is_mod and ctx.author.id != ctx.guild.owner_id:
+        if not self.is_mod(ctx):
             return # Silently ignore so non-admins don't even know it exists
 
         prefix = ctx.prefix
@@ -179,7 +524,8 @@ class SquadronManager(commands.Cog):
             f"`{prefix}transferowner` - Forcefully change a squad owner\n"
             f"`{prefix}rename` - Override a channel name\n"
             f"`{prefix}showlist [channel]` - Shows info for specified channel\n"
-            f"`{prefix}setcategory` - Moves all registered squadrons into the designated category\n"
+            f"`{prefix}setcategory` - Sets the category new squadrons are created in\n"
+            f"`{prefix}bulk <move/hide/unhide/reconcile>` - Runs an action on every squadron (`resume`/`cancel`)\n"
             f"`{prefix}config` - Opens the global event configuration menu."
         )
         embed.add_field(name="⚠️ Sensitive Commands", value=dev_cmds, inline=False)
@@ -190,58 +536,59 @@ class SquadronManager(commands.Cog):
     @commands.command()
     async def hide(self, ctx):
         """Manually hides the channel and sets state to HIDDEN."""
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if not squad or not self.is_mod_or_owner(ctx, squad):
             return await ctx.send("❌ Access denied.")
+
+        async with self.bot.channel_queues.hold(ctx.channel.id):
+            squad.is_hidden = True # Set current state
+            self.bot.save_squad(ctx.channel.id)
         
-        squad["is_hidden"] = True # Set current state
-        self.save_data(self.data)
-        
-        await self.update_permissions(ctx.channel, hide=True)
-        await ctx.send("🔒 **Channel manually hidden.** (State: Hidden)")
+            await self.update_permissions(ctx.channel, hide=True)
+            await ctx.send("🔒 **Channel manually hidden.** (State: Hidden)")
 
     @commands.command()
     async def unhide(self, ctx):
         """Manually unhides the channel and sets state to VISIBLE."""
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if not squad or not self.is_mod_or_owner(ctx, squad):
             return await ctx.send("❌ Access denied.")
+
+        async with self.bot.channel_queues.hold(ctx.channel.id):
+            squad.is_hidden = False # Set current state
+            self.bot.save_squad(ctx.channel.id)
         
-        squad["is_hidden"] = False # Set current state
-        self.save_data(self.data)
-        
-        await self.update_permissions(ctx.channel, hide=False)
-        await ctx.send("🔓 **Channel manually unhidden.** (State: Visible)")    
+            await self.update_permissions(ctx.channel, hide=False)
+            await ctx.send("🔓 **Channel manually unhidden.** (State: Visible)")
         
     @commands.command()
     async def clearactive(self, ctx):
         """Clears the active events list if it gets stuck."""
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if not squad or not self.is_mod_or_owner(ctx, squad):
             return await ctx.send("❌ Access denied.")
-        
-        squad["active_events"] = []
-        self.save_data(self.data)
-        await ctx.send("🧹 **Active events cleared for this channel.**")
+
+        async with self.bot.channel_queues.hold(ctx.channel.id):
+            squad.active_events = []
+            # Leftover expiry timers find nothing to end and are dropped
+            squad.event_deadlines = {}
+            self.bot.save_squad(ctx.channel.id)
+            await ctx.send("🧹 **Active events cleared for this channel.**")
 
     @commands.command()
     async def create(self, ctx, *, name: str):
-      if any(s["owner_id"] == ctx.author.id for s in self.data["squadrons"].values()):
+      if self.bot.squad_index.owned_by(ctx.author.id) is not None:
           return await ctx.send("❌ You already own a squadron!")
 
-      cat_id = self.data["server_configs"]["global"].get("CATEGORY_ID")
+      cat_id = self.data.config.category_id
       category = self.bot.get_channel(cat_id)
       
       # Create channel and update JSON
       new_channel = await ctx.guild.create_text_channel(name=name, category=category)
-      self.data["squadrons"][str(new_channel.id)] = {
-          "owner_id": ctx.author.id,
-          "members": [],
-          "events_enabled": True,
-          "squad_only_mode": False,
-          "active_events": []
-      }
-      self.save_data(self.data)
+      squad = Squadron(owner_id=ctx.author.id)
+      self.data.squadrons[new_channel.id] = squad
+      self.bot.squad_index.add_squad(new_channel.id, squad)
+      self.bot.save_squad(new_channel.id)
       
       # Set permissions
       await self.update_permissions(new_channel, hide=True)
@@ -257,23 +604,28 @@ class SquadronManager(commands.Cog):
       await new_channel.send(f"Welcome to your new squadron, {ctx.author.mention}!", embed=embed)
 
     async def get_squad_embed(self, channel_id):
-        """Helper to build the showlist embed with visibility status."""
-        squad = self.data["squadrons"].get(str(channel_id))
+        """The showlist embed, re-rendered only after the squadron was saved."""
+        squad = self.data.squadrons.get(channel_id)
         if not squad: return None
-        
-        owner = f"<@{squad['owner_id']}> (Owner)"
-        members = "\n".join([f"<@{uid}>" for uid in squad["members"]]) if squad["members"] else "None"
+        return self.embed_cache.render(
+            channel_id, self.bot.squad_version(channel_id), lambda: self.render_squad_embed(channel_id, squad)
+        )
+
+    def render_squad_embed(self, channel_id, squad):
+        """Helper to build the showlist embed with visibility status."""
+        owner = f"<@{squad.owner_id}> (Owner)"
+        members = "\n".join([f"<@{uid}>" for uid in squad.members]) if squad.members else "None"
         
         # Logic for Status text
-        event_status = "✅ Enabled" if squad.get("events_enabled", True) else "❌ Disabled"
+        event_status = "✅ Enabled" if squad.events_enabled else "❌ Disabled"
         
         # Improved Squad-Only status text
-        if squad.get("squad_only_mode", False):
+        if squad.squad_only_mode:
             squad_only = "🔒 **ON** (Always Hidden)"
         else:
             squad_only = "🔓 **OFF** (Public after events)"
 
-        state_text = "🙈 Hidden" if squad.get("is_hidden", True) else "👁️ Visible"
+        state_text = "🙈 Hidden" if squad.is_hidden else "👁️ Visible"
         
         embed = discord.Embed(
             title="👥 Squadron Information", 
@@ -286,7 +638,7 @@ class SquadronManager(commands.Cog):
         embed.add_field(name="⭐ Owner", value=owner, inline=False)
         embed.add_field(name="Members", value=members, inline=False)
         
-        active = ", ".join(squad.get("active_events", []))
+        active = ", ".join(squad.active_events)
         if active:
             embed.add_field(name="🔥 Active Events", value=active.upper(), inline=False)
 
@@ -299,15 +651,13 @@ class SquadronManager(commands.Cog):
         # Default to current channel if none provided
         target = target_channel or ctx.channel
         
-        squad = self.data["squadrons"].get(str(target.id))
+        squad = self.data.squadrons.get(target.id)
         if not squad:
             return await ctx.send(f"❌ <#{target.id}> is not a registered squadron channel.")
 
         # Permission Check: Only allow viewing OTHER channels if user is Mod/Owner
         if target != ctx.channel:
-            mod_role_id = self.data.get("server_configs", {}).get("global", {}).get("MODERATOR_ROLE_ID")
-            is_mod = ctx.author.guild_permissions.manage_channels or any(r.id == mod_role_id for r in ctx.author.roles)
-            if not is_mod:
+            if not self.is_mod(ctx):
                 return await ctx.send("❌ You can only use `?showlist` for other channels if you are a Moderator.")
 
         embed = await self.get_squad_embed(target.id)
@@ -315,25 +665,26 @@ class SquadronManager(commands.Cog):
 
     @commands.command(aliases=["changeowner"])
     async def transferowner(self, ctx, new_owner: discord.Member):
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if not squad or not self.is_mod_or_owner(ctx, squad):
             return await ctx.send("❌ Access denied.")
 
-        old_owner_id = squad["owner_id"]
-        squad["owner_id"] = new_owner.id
-        if old_owner_id not in squad["members"]:
-            squad["members"].append(old_owner_id)
-        if new_owner.id in squad["members"]:
-            squad["members"].remove(new_owner.id)
+        old_owner_id = squad.owner_id
+        squad.owner_id = new_owner.id
+        if old_owner_id not in squad.members:
+            squad.members.append(old_owner_id)
+        if new_owner.id in squad.members:
+            squad.members.remove(new_owner.id)
+        self.bot.squad_index.set_owner(ctx.channel.id, old_owner_id, new_owner.id)
 
-        self.save_data(self.data)
+        self.bot.save_squad(ctx.channel.id)
         await self.update_permissions(ctx.channel, hide=True)
         await ctx.send(f"👑 Ownership transferred to {new_owner.mention}!")
 
     @commands.command()
     async def squadonly(self, ctx, toggle: str):
         """Toggles Squad-Only Mode (Always Hidden). Usage: ?squadonly on/off"""
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         
         # 1. Permission Check
         if not squad or not self.is_mod_or_owner(ctx, squad):
@@ -348,13 +699,14 @@ class SquadronManager(commands.Cog):
             return await ctx.send("❓ Invalid input! Please use `?squadonly on` or `?squadonly off`.")
 
         # 3. Save and Update
-        squad["squad_only_mode"] = state
-        self.save_data(self.data)
+        squad.squad_only_mode = state
+        self.bot.save_squad(ctx.channel.id)
         
         # If toggling ON, hide the channel immediately. 
         # If toggling OFF, we leave it as is (it will unhide on next event or via ?unhide)
         if state:
-            await self.update_permissions(ctx.channel, hide=True)
+            async with self.bot.channel_queues.hold(ctx.channel.id):
+                await self.update_permissions(ctx.channel, hide=True)
             await ctx.send("🔒 **Squad-Only Mode: ON**. This channel will now remain hidden even during events.")
         else:
             await ctx.send("🔓 **Squad-Only Mode: OFF**. This channel will now unhide automatically when RPG events start.")
@@ -371,47 +723,56 @@ class SquadronManager(commands.Cog):
             )
     @commands.command()
     async def rename(self, ctx, *, new_name: str):
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if not squad or not self.is_mod_or_owner(ctx, squad):
             return await ctx.send("❌ Access denied.")
 
-        await ctx.channel.edit(name=new_name)
+        await self.bot.rest.run(
+            f"edit:{ctx.channel.id}", lambda: ctx.channel.edit(name=new_name), priority=PRIORITY_PERMISSIONS
+        )
         await ctx.send(f"📝 Channel renamed to `{new_name}`.")
 
     @commands.command()
     async def allow(self, ctx, member: discord.Member):
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if not squad or not self.is_mod_or_owner(ctx, squad): return
-        if member.id not in squad["members"]:
-            squad["members"].append(member.id)
-            self.save_data(self.data)
+        if member.id not in squad.members:
+            squad.members.append(member.id)
+            self.bot.squad_index.add_member(ctx.channel.id, member.id)
+            self.bot.save_squad(ctx.channel.id)
             await self.update_permissions(ctx.channel, hide=True)
             await ctx.send(f"✅ {member.mention} added.")
 
     @commands.command()
     async def deny(self, ctx, member: discord.Member):
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if not squad or not self.is_mod_or_owner(ctx, squad): return
-        if member.id in squad["members"]:
-            squad["members"].remove(member.id)
-            self.save_data(self.data)
-            await ctx.channel.set_permissions(member, overwrite=None)
+        if member.id in squad.members:
+            squad.members.remove(member.id)
+            if member.id != squad.owner_id:
+                self.bot.squad_index.remove_member(ctx.channel.id, member.id)
+            self.bot.save_squad(ctx.channel.id)
+            await self.bot.rest.run(
+                f"perms:{ctx.channel.id}", lambda: ctx.channel.set_permissions(member, overwrite=None),
+                priority=PRIORITY_PERMISSIONS
+            )
+            self.overwrites.update(ctx.channel, member, None)
             await ctx.send(f"❌ {member.mention} removed.")
             
     @commands.command()
     async def eventson(self, ctx):
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if squad:
-            squad["events_enabled"] = True
-            self.save_data(self.data)
+            squad.events_enabled = True
+            self.bot.save_squad(ctx.channel.id)
             await ctx.send("🔔 Events enabled (Channel will unhide).")
 
     @commands.command()
     async def eventsoff(self, ctx):
-        squad = self.data["squadrons"].get(str(ctx.channel.id))
+        squad = self.data.squadrons.get(ctx.channel.id)
         if squad:
-            squad["events_enabled"] = False
-            self.save_data(self.data)
+            squad.events_enabled = False
+            self.bot.save_squad(ctx.channel.id)
             await ctx.send("🔕 Events disabled (Pings only, no unhide).")
 
 async def setup(bot):
@@ -1,13 +1,28 @@
 import discord
 from discord.ext import commands
-import json
 import os
 from dotenv import load_dotenv
 from cogs.help import CustomHelp
+from utils.auth import AuthResolver
+from utils.channel_queues import ChannelQueues
+from utils.compiled_config import compile_config
+from utils.indexes import SquadIndex
+from utils.rest import RestScheduler
+from utils.router import MessageRouter
+from utils.storage import JsonStore, JournalStore, SqliteStore
 
+# Python 3.10+ (the models use dataclass(slots=True)), nothing needs 3.11
 load_dotenv()
 TOKEN = os.getenv("TOKEN")
 DATA_FILE = "squadrons_data.json"
+DB_FILE = "squadrons_data.db"
+# "json" (default), "sqlite" or "journal"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+# Journal backend: compact into the snapshot past this size (bytes) or age (seconds)
+JOURNAL_MAX_BYTES = int(os.getenv("JOURNAL_MAX_BYTES", 1_000_000))
+JOURNAL_MAX_AGE = float(os.getenv("JOURNAL_MAX_AGE", 600))
+# Seconds to merge saves before writing to disk
+SAVE_DELAY = float(os.getenv("SAVE_DELAY", 2.0))
 
 class Bot(commands.Bot):
     def __init__(self):
@@ -30,36 +45,126 @@ class Bot(commands.Bot):
         ]
         
         self.data_file = DATA_FILE
+        self.store = self.create_store()
+        self.squad_index = SquadIndex()
+        # Filled by the cogs in cog_load, used by GlobalListeners to dispatch messages
+        self.router = MessageRouter()
+        # Per-channel ordering for anything that touches a squadron's event/visibility state
+        self.channel_queues = ChannelQueues()
+        # Outbound REST calls from the cogs, prioritized per route
+        self.rest = RestScheduler()
+        self.compiled_config = None
+        # Cached moderator checks, keyed on the compiled config version
+        self.auth = AuthResolver()
+        # Bumped on every save/reload, caches built from the data are keyed on it
+        self.data_version = 0
+        # channel ID -> data_version of its last save, and the version of the last full save/reload
+        self.squad_versions = {}
+        self.all_squads_version = 0
         self.squad_data = self.load_data()
 
+    def create_store(self):
+        if STORAGE_BACKEND == "sqlite":
+            # The existing JSON file is imported once if the database is empty
+            return SqliteStore(DB_FILE, flush_delay=SAVE_DELAY, import_from=self.data_file)
+        if STORAGE_BACKEND == "journal":
+            # squadrons_data.json becomes the snapshot the journal is replayed on
+            return JournalStore(self.data_file, max_bytes=JOURNAL_MAX_BYTES, max_age=JOURNAL_MAX_AGE)
+        return JsonStore(self.data_file, flush_delay=SAVE_DELAY)
+
     def load_data(self):
-        if os.path.exists(self.data_file):
-            with open(self.data_file, "r") as f:
-                data = json.load(f)
-            
-            changes_made = False
-            for squad_id, info in data.get("squadrons", {}).items():
-                if "is_hidden" not in info:
-                    info["is_hidden"] = True
-                    changes_made = True
-            
-            if changes_made:
-                self.save_data(data)
-                print("🛠️ Fixed missing 'is_hidden' keys in JSON.")
-                
-            return data
-        return {"server_configs": {"global": {}}, "squadrons": {}}
+        # Schema migrations run inside the store and only when the stored version is behind
+        data = self.store.load()
+        if self.store.migrated:
+            self.save_data(data)
+
+        # Reverse lookups (user -> squadrons, owner -> squadron) for ?squad and ?create
+        self.squad_index.rebuild(data.squadrons)
+        self.refresh_config(data)
+        return data
     
     def reload_data(self):
-        self.squad_data = self.load_data()
-        return self.squad_data
+        """Re-reads the store and applies only the differences to the live data.
+
+        squad_data stays the same object, so cogs holding it by reference see
+        the reload, and the index, compiled config and cog caches are only
+        updated for what actually changed. Squadrons and configs with a save
+        still pending keep their live state.
+        """
+        # Anything saved in memory but not written yet isn't in the store, the live copy wins
+        squads, config, everything = self.store.pending()
+        fresh = self.store.load()
+        live = self.squad_data
+        if everything:
+            squads, config = set(live.squadrons) | set(fresh.squadrons), True
+        for channel_id in squads:
+            if channel_id in live.squadrons:
+                fresh.squadrons[channel_id] = live.squadrons[channel_id]
+            else:
+                fresh.squadrons.pop(channel_id, None)
+        if config:
+            fresh.server_configs = dict(live.server_configs)
+
+        diff = self.squad_data.apply(fresh)
+        diff.kept = len(squads) + config
+        # The store keeps writing the live object, not the one it just loaded
+        self.store.data = self.squad_data
+        if self.store.migrated:
+            self.save_data()
+
+        for channel_id, squad in diff.removed.items():
+            self.squad_index.remove_squad(channel_id, squad)
+        for channel_id, (before, squad) in diff.changed.items():
+            self.squad_index.remove_squad(channel_id, before)
+            self.squad_index.add_squad(channel_id, squad)
+        for channel_id, squad in diff.added.items():
+            self.squad_index.add_squad(channel_id, squad)
+        if diff.config_scopes:
+            self.refresh_config()
+
+        if diff:
+            self.data_version += 1
+            for channel_id in (*diff.added, *diff.changed, *diff.removed):
+                self.squad_versions[channel_id] = self.data_version
+            # Cogs with their own derived state (timers, caches) listen for this
+            self.dispatch("data_reloaded", diff)
+        return diff
 
     def save_data(self, data=None):
+        # Only marks the data dirty, the store merges saves and writes in the background
         to_save = data if data is not None else self.squad_data
-        with open(self.data_file, "w") as f:
-            json.dump(to_save, f, indent=4)
+        self.data_version += 1
+        self.all_squads_version = self.data_version
+        self.store.mark_dirty(to_save)
+
+    def save_squad(self, channel_id):
+        # Saves a single squadron, a removed squadron gets deleted
+        self.data_version += 1
+        self.squad_versions[int(channel_id)] = self.data_version
+        self.store.mark_squad(channel_id)
+
+    def squad_version(self, channel_id):
+        """Changes whenever the squadron is saved, for caches rendered from it."""
+        return max(self.squad_versions.get(channel_id, 0), self.all_squads_version)
+
+    def save_config(self):
+        # Every config change goes through here, so this is where the snapshot is rebuilt
+        self.refresh_config()
+        self.data_version += 1
+        self.store.mark_config()
+
+    def refresh_config(self, data=None):
+        """Rebuilds the compiled config snapshot the event hot path reads."""
+        data = data if data is not None else self.squad_data
+        old = self.compiled_config
+        version = old.version + 1 if old else 1
+        self.compiled_config = compile_config(data.config, version)
+        if old is not None:
+            # Lets cogs re-register anything keyed on the config (e.g. the RPG bot routes)
+            self.dispatch("config_compiled", self.compiled_config, old)
 
     async def setup_hook(self):
+        self.rest.start()
         # Loops through the single list defined in __init__
         for ext in self.cogslist:
             await self.load_extension(f"cogs.{ext}")
@@ -67,6 +172,12 @@ class Bot(commands.Bot):
 
     async def on_ready(self):
         print(f"✅ Logged in as {self.user.name}")
+
+    async def close(self):
+        # Cogs unload and the gateway disconnects first, so nothing can mark data dirty after the final flush
+        await super().close()
+        await self.rest.stop()
+        await self.store.close()
     
 client = Bot()
 
@@ -83,9 +194,9 @@ async def reload(ctx, extension: str):
 @client.command()
 @commands.is_owner()
 async def reloadjson(ctx):
-    """Force reloads the JSON file."""
-    client.reload_data()
-    await ctx.send(f"🔄 Data from `{DATA_FILE}` has been re-synced!")
+    """Force reloads the data from the storage backend (JSON file, journal or database)."""
+    diff = client.reload_data()
+    await ctx.send(f"🔄 Data from `{client.store.path}` has been re-synced! ({diff.summary()})")
 
 @client.command(hidden=True)
 @commands.has_permissions(administrator=True)
@@ -0,0 +1,151 @@
+import json
+import random
+
+from utils.history import RAW_RETENTION, Dense, EventHistory
+
+DAY = 86400
+# A day boundary far enough from 0 that every window stays positive
+T0 = 20_000 * DAY
+
+
+# --- DENSE ---
+def test_dense_grows_at_both_ends():
+    dense = Dense()
+    dense.add("a", 10, 1)
+    dense.add("a", 13, 2)
+    assert (dense.base, dense.length) == (10, 4)
+    assert list(dense.columns["a"]) == [1, 0, 0, 2]
+
+    # Slots before the base pad every column at the front
+    dense.add("b", 7, 5)
+    assert (dense.base, dense.length) == (7, 7)
+    assert list(dense.columns["a"]) == [0, 0, 0, 1, 0, 0, 2]
+    assert list(dense.columns["b"]) == [5, 0, 0, 0, 0, 0, 0]
+
+
+def test_dense_totals_are_clipped_to_the_window():
+    dense = Dense()
+    for slot in range(5, 10):
+        dense.add("a", slot, slot)
+    assert dense.total("a", None, 100) == sum(range(5, 10))
+    assert dense.total("a", 7, 8) == 7 + 8
+    assert dense.total("a", 0, 4) == 0
+    assert dense.total("a", 20, 30) == 0
+    assert dense.total("missing", None, 100) == 0
+    assert Dense().total("a", None, 100) == 0
+
+
+def test_dense_trim():
+    dense = Dense()
+    for slot in range(24, 72):
+        dense.add("a", slot, 1)
+    dense.trim(48)
+    assert (dense.base, dense.length) == (48, 24)
+    assert dense.total("a", None, 100) == 24
+    # Trimming everything keeps the base where the next slot should start
+    dense.trim(96)
+    assert (dense.base, dense.length) == (96, 0)
+    dense.add("a", 100, 1)
+    assert (dense.base, dense.length) == (96, 5)
+
+
+# --- HISTORY ---
+def brute_stats(events, channel_id, window, now):
+    """What stats() should return, from the plain list of (ts, channel, event, duration)."""
+    first = int((now - window) // 3600) if window else None
+    if first is not None and first * 3600 < now - RAW_RETENTION - DAY:
+        # Windows past the retention period start at the beginning of that day
+        first = first // 24 * 24
+    last = int(now // 3600)
+    counts, durations, timed, by_hour = {}, {}, {}, [0] * 24
+    for ts, chan, event, duration in events:
+        if channel_id is not None and chan != channel_id:
+            continue
+        hour = int(ts) // 3600
+        if (first is None or hour >= first) and hour <= last:
+            counts[event] = counts.get(event, 0) + 1
+            by_hour[hour % 24] += 1
+        end_hour = int(ts + duration) // 3600
+        if (first is None or end_hour >= first) and end_hour <= last:
+            durations[event] = durations.get(event, 0) + duration
+            timed[event] = timed.get(event, 0) + 1
+    return counts, {e: durations[e] / timed[e] for e in timed}, by_hour
+
+
+def build(days, rollup_every=3600, seed=1):
+    rng = random.Random(seed)
+    history, events = EventHistory(), []
+    ts, last_rollup = T0, T0
+    while ts < T0 + days * DAY:
+        chan, event, duration = rng.randrange(4), rng.choice(["arena", "boss", "lure"]), rng.randrange(30, 120)
+        history.record(chan, event, False, ts)
+        history.record(chan, event, True, ts + duration)
+        events.append((ts, chan, event, duration))
+        ts += rng.randrange(300, 1500)
+        if ts - last_rollup >= rollup_every:
+            history.rollup(ts)
+            last_rollup = ts
+    return history, events, ts
+
+
+def assert_matches(history, events, now):
+    for channel_id in (None, 0, 3):
+        for window in (3600, DAY, 7 * DAY, 10 * DAY, 30 * DAY, None):
+            stats = history.stats(channel_id, window, now)
+            counts, averages, by_hour = brute_stats(events, channel_id, window, now)
+            assert stats["counts"] == counts
+            assert stats["avg_duration"].keys() == averages.keys()
+            for event, average in averages.items():
+                assert abs(stats["avg_duration"][event] - average) < 1e-9
+            top = sorted(by_hour, reverse=True)[:len(stats["busiest_hours"])]
+            assert [count for _, count in stats["busiest_hours"]] == top
+            assert all(by_hour[hour] == count for hour, count in stats["busiest_hours"])
+
+
+def test_stats_before_rollup():
+    history, events, now = build(days=3, rollup_every=10 * DAY)
+    assert len(history) == 2 * len(events)
+    assert_matches(history, events, now)
+
+
+def test_stats_after_rollup():
+    history, events, now = build(days=20)
+    # Raw rows past the retention are gone, the counters still cover them
+    assert history.timestamps[0] >= now - RAW_RETENTION - 2 * 3600
+    assert history.server.hours.base % 24 == 0
+    assert history.server.days.base == T0 // DAY
+    assert_matches(history, events, now)
+
+
+def test_busiest_hours():
+    history = EventHistory()
+    for hour, times in ((3, 5), (14, 2), (20, 7)):
+        for day in range(10):
+            for _ in range(times):
+                history.record(1, "arena", False, T0 + day * DAY + hour * 3600)
+    now = T0 + 10 * DAY
+    history.rollup(now)
+    # Spans both the daily part (hour of day columns) and the hourly part (strided sums)
+    assert history.stats(None, None, now)["busiest_hours"] == [(20, 70), (3, 50), (14, 20)]
+    assert history.stats(1, DAY, now)["busiest_hours"] == [(20, 7), (3, 5), (14, 2)]
+
+
+def test_unknown_channel_is_empty():
+    history, _, now = build(days=1)
+    assert history.stats(12345, None, now) == {"counts": {}, "avg_duration": {}, "busiest_hours": []}
+
+
+def test_round_trip():
+    history, events, now = build(days=12)
+    history.record(2, "boss", False, now)
+    loaded = EventHistory.from_dict(json.loads(json.dumps(history.to_dict())))
+
+    assert len(loaded) == len(history)
+    for channel_id in (None, 0, 2):
+        for window in (DAY, 30 * DAY, None):
+            assert loaded.stats(channel_id, window, now + 1) == history.stats(channel_id, window, now + 1)
+
+    # Open events and interned codes survive, so an end after loading still gets its duration
+    loaded.record(2, "boss", True, now + 90)
+    assert loaded.stats(2, DAY, now + 3600)["avg_duration"]["boss"] > 0
+    assert loaded.event_codes == history.event_codes
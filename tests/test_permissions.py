@@ -0,0 +1,84 @@
+import asyncio
+
+from utils.permissions import OverwriteTracker, apply_overwrites, plan_overwrites
+
+
+class FakeChannel:
+    """Stands in for a TextChannel whose overwrites only change on a gateway update."""
+
+    def __init__(self, channel_id, overwrites):
+        self.id = channel_id
+        self.overwrites = dict(overwrites)
+        self.calls = []
+
+    async def set_permissions(self, target, overwrite=None, reason=None):
+        self.calls.append(("set_permissions", target, overwrite))
+
+    async def edit(self, overwrites=None, reason=None):
+        self.calls.append(("edit", dict(overwrites)))
+
+    def gateway_update(self):
+        # What the next CHANNEL_UPDATE would put in the cache
+        state = {}
+        for call in self.calls:
+            if call[0] == "edit":
+                state = dict(call[1])
+            else:
+                state = dict(state or self.overwrites)
+                _, target, overwrite = call
+                if overwrite is None:
+                    state.pop(target, None)
+                else:
+                    state[target] = overwrite
+        self.overwrites = state
+
+
+def test_plan_overwrites():
+    assert plan_overwrites({"a": 1}, {"a": 1}) == []
+    assert plan_overwrites({"a": 1, "b": 2}, {"a": 3}) == [("a", 3), ("b", None)]
+
+
+def test_unhide_right_after_hide_is_not_a_no_op():
+    channel = FakeChannel(1, {"everyone": "visible", "owner": "view"})
+    tracker = OverwriteTracker()
+    hidden = {"everyone": "hidden", "owner": "view"}
+    visible = {"everyone": "visible", "owner": "view"}
+
+    assert asyncio.run(apply_overwrites(channel, hidden, tracker=tracker)) == 1
+    # The gateway hasn't caught up, the cache still says visible
+    assert asyncio.run(apply_overwrites(channel, visible, tracker=tracker)) == 1
+    assert channel.calls[-1] == ("set_permissions", "everyone", "visible")
+
+
+def test_without_tracker_stale_cache_skips_the_unhide():
+    channel = FakeChannel(1, {"everyone": "visible"})
+    asyncio.run(apply_overwrites(channel, {"everyone": "hidden"}))
+    assert asyncio.run(apply_overwrites(channel, {"everyone": "visible"})) == 0
+
+
+def test_seen_drops_entry_once_cache_caught_up():
+    channel = FakeChannel(1, {"everyone": "visible", "owner": "view"})
+    tracker = OverwriteTracker()
+    asyncio.run(apply_overwrites(channel, {"everyone": "hidden", "owner": "view"}, tracker=tracker))
+
+    tracker.seen(channel)
+    assert 1 in tracker.applied
+    channel.gateway_update()
+    tracker.seen(channel)
+    assert 1 not in tracker.applied
+    assert tracker.current(channel) == {"everyone": "hidden", "owner": "view"}
+
+
+def test_entries_expire():
+    channel = FakeChannel(1, {"everyone": "visible"})
+    tracker = OverwriteTracker(ttl=0)
+    tracker.record(1, {"everyone": "hidden"})
+    assert tracker.current(channel) == {"everyone": "visible"}
+    assert tracker.applied == {}
+
+
+def test_update_records_single_change():
+    channel = FakeChannel(1, {"everyone": "hidden", "member": "view"})
+    tracker = OverwriteTracker()
+    tracker.update(channel, "member", None)
+    assert tracker.current(channel) == {"everyone": "hidden"}
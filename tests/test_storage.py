@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+import threading
+
+from utils.models import SCHEMA_VERSION, BotData, Squadron
+from utils.storage import JournalStore, JsonStore, SqliteStore
+
+
+def squads(*channel_ids):
+    return BotData(squadrons={cid: Squadron(owner_id=cid * 10) for cid in channel_ids})
+
+
+# --- PENDING CHANGES ---
+def test_pending_until_flushed(tmp_path):
+    async def run():
+        store = JsonStore(str(tmp_path / "data.json"), flush_delay=60)
+        store.data = squads(1, 2)
+        assert store.pending() == (set(), False, False)
+
+        store.mark_squad(1)
+        store.mark_config()
+        assert store.pending() == ({1}, True, False)
+        store.mark_dirty()
+        assert store.pending() == ({1}, True, True)
+
+        await store.flush()
+        assert store.pending() == (set(), False, False)
+        await store.close()
+
+    asyncio.run(run())
+
+
+def test_write_in_flight_is_still_pending(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    class SlowStore(JsonStore):
+        def _write(self, snapshot):
+            started.set()
+            release.wait(5)
+            super()._write(snapshot)
+
+    async def run():
+        store = SlowStore(str(tmp_path / "data.json"), flush_delay=60)
+        store.data = squads(1, 2)
+        store.mark_squad(2)
+        flush = asyncio.create_task(store.flush())
+        await asyncio.to_thread(started.wait, 5)
+
+        # Marked after the snapshot was taken, so it goes into the next write
+        store.mark_squad(1)
+        assert store.pending() == ({1, 2}, False, False)
+
+        release.set()
+        await flush
+        assert store.pending() == ({1}, False, False)
+        await store.close()
+
+    asyncio.run(run())
+
+
+def test_failed_write_stays_pending(tmp_path):
+    class BrokenStore(JsonStore):
+        def _write(self, snapshot):
+            raise OSError("disk full")
+
+    async def run():
+        store = BrokenStore(str(tmp_path / "data.json"), flush_delay=60)
+        store.data = squads(1)
+        store.mark_squad(1)
+        await store.flush()
+        assert store.pending() == ({1}, False, False)
+        assert store.has_pending()
+
+    asyncio.run(run())
+
+
+def test_flush_now_without_loop(tmp_path):
+    store = JsonStore(str(tmp_path / "data.json"))
+    store.data = squads(1)
+    # No running loop: the save is written right away
+    store.mark_squad(1)
+    assert store.pending() == (set(), False, False)
+    assert JsonStore(str(tmp_path / "data.json")).load().squadrons == {1: Squadron(owner_id=10)}
+
+
+# --- JOURNAL ---
+def journal_store(tmp_path, **kwargs):
+    kwargs.setdefault("max_age", 60)
+    return JournalStore(str(tmp_path / "data.json"), **kwargs)
+
+
+def test_journal_replays_on_load(tmp_path):
+    async def run():
+        store = journal_store(tmp_path)
+        data = store.load()
+        data.squadrons[1] = Squadron(owner_id=10)
+        store.mark_squad(1)
+        data.squadrons[2] = Squadron(owner_id=20, members=[5])
+        store.mark_squad(2)
+        del data.squadrons[1]
+        store.mark_squad(1)
+        data.config.category_id = 99
+        store.mark_config()
+        # Crash: no compaction, only the journal is on disk
+        store._journal.close()
+
+    asyncio.run(run())
+    assert not (tmp_path / "data.json").exists()
+    loaded = journal_store(tmp_path).load()
+    assert loaded.squadrons == {2: Squadron(owner_id=20, members=[5])}
+    assert loaded.config.category_id == 99
+
+
+def test_journal_torn_tail(tmp_path):
+    async def run():
+        store = journal_store(tmp_path)
+        store.load().squadrons[1] = Squadron(owner_id=10)
+        store.mark_squad(1)
+        store._journal.close()
+
+    asyncio.run(run())
+    journal = tmp_path / "data.json.journal"
+    with open(journal, "a") as f:
+        f.write('{"op":"put_squad","id":"2","squad":{"own')
+
+    async def reopen():
+        store = journal_store(tmp_path)
+        data = store.load()
+        assert data.squadrons == {1: Squadron(owner_id=10)}
+        # The partial line is cut off, so the next entry starts on its own line
+        assert journal.read_text().endswith("}\n")
+        data.squadrons[3] = Squadron(owner_id=30)
+        store.mark_squad(3)
+        store._journal.close()
+
+    asyncio.run(reopen())
+    assert set(journal_store(tmp_path).load().squadrons) == {1, 3}
+
+
+def test_journal_leftover_rotated_file(tmp_path):
+    # A compaction that crashed before the snapshot was written leaves .journal.old behind
+    (tmp_path / "data.json").write_text(json.dumps({"schema_version": SCHEMA_VERSION, "squadrons": {}}))
+    (tmp_path / "data.json.journal.old").write_text(
+        json.dumps({"op": "put_squad", "id": "1", "squad": {"owner_id": 10}}) + "\n"
+        + json.dumps({"op": "put_squad", "id": "2", "squad": {"owner_id": 20}}) + "\n"
+    )
+    (tmp_path / "data.json.journal").write_text(
+        json.dumps({"op": "del_squad", "id": "1"}) + "\n"
+        + json.dumps({"op": "put_squad", "id": "2", "squad": {"owner_id": 20, "members": [7]}}) + "\n"
+    )
+
+    async def run():
+        store = journal_store(tmp_path)
+        data = store.load()
+        # The rotated journal is older, the current one is applied after it
+        assert data.squadrons == {2: Squadron(owner_id=20, members=[7])}
+        assert store.has_pending()
+
+        await store.flush()
+        assert not (tmp_path / "data.json.journal.old").exists()
+        assert (tmp_path / "data.json.journal").read_text() == ""
+        await store.close()
+
+    asyncio.run(run())
+    assert journal_store(tmp_path).load().squadrons == {2: Squadron(owner_id=20, members=[7])}
+
+
+def test_journal_rotation_while_snapshot_in_flight(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    class SlowJournal(JournalStore):
+        def _write(self, snapshot):
+            started.set()
+            release.wait(5)
+            super()._write(snapshot)
+
+    async def run(crash):
+        store = SlowJournal(str(tmp_path / "data.json"), max_age=60)
+        data = store.load()
+        data.squadrons[1] = Squadron(owner_id=10)
+        store.mark_squad(1)
+        flush = asyncio.create_task(store.flush())
+        await asyncio.to_thread(started.wait, 5)
+
+        # Appended after the rotation, lands in the fresh journal
+        data.squadrons[2] = Squadron(owner_id=20)
+        store.mark_squad(2)
+        assert (tmp_path / "data.json.journal.old").exists()
+        assert '"id":"2"' in (tmp_path / "data.json.journal").read_text()
+
+        if crash:
+            # Nothing was written yet: both journals together still have everything
+            store._journal.close()
+            assert set(journal_store(tmp_path).load().squadrons) == {1, 2}
+            release.set()
+            await flush
+            return
+
+        release.set()
+        await flush
+        assert not (tmp_path / "data.json.journal.old").exists()
+        # The snapshot holds the first entry, the journal the one made during the write
+        assert set(json.loads((tmp_path / "data.json").read_text())["squadrons"]) >= {"1"}
+        store._journal.close()
+
+    asyncio.run(run(crash=True))
+    for path in tmp_path.iterdir():
+        path.unlink()
+    started.clear()
+    release.clear()
+    asyncio.run(run(crash=False))
+    assert set(journal_store(tmp_path).load().squadrons) == {1, 2}
+
+
+def test_journal_compacts_past_max_bytes(tmp_path):
+    async def run():
+        store = journal_store(tmp_path, max_bytes=500)
+        data = store.load()
+        for cid in range(1, 20):
+            data.squadrons[cid] = Squadron(owner_id=cid, members=list(range(10)))
+            store.mark_squad(cid)
+            # Lets a size-triggered compaction run
+            await asyncio.sleep(0)
+        while store._write_lock.locked() or store._inflight and not store._inflight.done():
+            await asyncio.sleep(0.01)
+
+        assert (tmp_path / "data.json").exists()
+        assert store._journal_size < 500
+        assert os.path.getsize(tmp_path / "data.json.journal") == store._journal_size
+        await store.close()
+
+    asyncio.run(run())
+    assert set(journal_store(tmp_path).load().squadrons) == set(range(1, 20))
+
+
+# --- SQLITE ---
+def test_sqlite_imports_json_once(tmp_path):
+    json_path = tmp_path / "data.json"
+    json_path.write_text(json.dumps({
+        "schema_version": 1,
+        "server_configs": {"global": {"CATEGORY_ID": "42", "event_configs": {"arena": {"role": 5, "msg": "go"}}}},
+        "squadrons": {"1": {"owner_id": "10", "members": ["11", 12], "active_events": ["arena"],
+                            "event_deadlines": {"arena": 123.0}}},
+    }))
+    store = SqliteStore(str(tmp_path / "data.db"), import_from=str(json_path))
+    data = store.load()
+    assert data.squadrons == {1: Squadron(
+        owner_id=10, members=[11, 12], active_events=["arena"], is_hidden=True, event_deadlines={"arena": 123.0}
+    )}
+    assert data.config.category_id == 42
+    assert data.config.event_configs["arena"].msg == "go"
+    store.conn.close()
+
+    # Once the database has rows, the JSON file is ignored
+    json_path.write_text(json.dumps({"squadrons": {"2": {"owner_id": 20}}}))
+    store = SqliteStore(str(tmp_path / "data.db"), import_from=str(json_path))
+    assert set(store.load().squadrons) == {1}
+    store.conn.close()
+
+
+def test_sqlite_upsert_and_delete(tmp_path):
+    async def run():
+        store = SqliteStore(str(tmp_path / "data.db"), flush_delay=60)
+        data = store.load()
+        data.squadrons[1] = Squadron(owner_id=10, members=[1, 2, 3], active_events=["boss"])
+        data.squadrons[2] = Squadron(owner_id=20)
+        store.mark_squad(1)
+        store.mark_squad(2)
+        await store.flush()
+
+        # Shorter member list and no events: the old child rows must go
+        data.squadrons[1].members = [3]
+        data.squadrons[1].active_events = []
+        data.squadrons[1].is_hidden = False
+        store.mark_squad(1)
+        del data.squadrons[2]
+        store.mark_squad(2)
+        data.config.moderator_role_id = 7
+        store.mark_config()
+        await store.close()
+
+    asyncio.run(run())
+    store = SqliteStore(str(tmp_path / "data.db"))
+    data = store.load()
+    assert data.squadrons == {1: Squadron(owner_id=10, members=[3], is_hidden=False)}
+    assert data.config.moderator_role_id == 7
+    store.conn.close()
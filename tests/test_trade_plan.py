@@ -0,0 +1,128 @@
+from utils.trade_plan import AREA_RATIOS, BASE_GUIDES, DISMANTLE_RETURNS, TRADE_IDS, format_amount, plan_trades
+
+
+def plan(area, inventory):
+    return plan_trades(inventory, BASE_GUIDES[area], AREA_RATIOS.get(area, {}), DISMANTLE_RETURNS, TRADE_IDS)
+
+
+def steps(result):
+    return [(step.command, step.gives_amount, step.gets, step.gets_amount) for step in result.steps]
+
+
+def test_every_guide_area_is_covered():
+    tested = {2, 3, 4, 5, 7, 8, 9, 10, 11, 12, 15}
+    assert set(BASE_GUIDES) == tested
+
+
+def test_area_2():
+    result = plan(2, {"epic log": 2, "wooden log": 10})
+    assert steps(result) == [
+        ("rpg dismantle epic log all", 2, "wooden log", 40),
+        ("rpg trade b all", 50, "normie fish", 50),
+    ]
+    assert result.final == {"normie fish": 50}
+
+
+def test_area_3():
+    result = plan(3, {"banana": 2, "apple": 5, "wooden log": 1})
+    assert steps(result) == [
+        ("rpg dismantle banana all", 2, "apple", 24),
+        ("rpg trade c all", 29, "wooden log", 87),
+        ("rpg trade b all", 88, "normie fish", 88),
+    ]
+    assert result.final == {"normie fish": 88}
+
+
+def test_area_4():
+    result = plan(4, {"golden fish": 2, "normie fish": 3, "wooden log": 3})
+    assert steps(result) == [
+        ("rpg dismantle golden fish all", 2, "normie fish", 24),
+        ("rpg trade a all", 27, "wooden log", 54),
+        ("rpg trade d all", 56, "apple", 14),
+    ]
+    assert result.final == {"wooden log": 1, "apple": 14}
+
+
+def test_area_5():
+    result = plan(5, {"ruby": 1, "normie fish": 4, "wooden log": 10})
+    assert steps(result) == [
+        ("rpg trade e all", 1, "wooden log", 450),
+        ("rpg trade a all", 4, "wooden log", 8),
+        ("rpg trade d all", 468, "apple", 117),
+    ]
+    assert result.final == {"apple": 117}
+
+
+def test_area_7():
+    result = plan(7, {"banana": 1, "apple": 4})
+    assert steps(result) == [
+        ("rpg dismantle banana all", 1, "apple", 12),
+        ("rpg trade c all", 16, "wooden log", 240),
+    ]
+    assert result.final == {"wooden log": 240}
+
+
+def test_area_8():
+    result = plan(8, {"ruby": 1, "epic fish": 1, "wooden log": 5})
+    assert steps(result) == [
+        ("rpg dismantle epic fish all", 1, "golden fish", 80),
+        ("rpg dismantle golden fish all", 80, "normie fish", 960),
+        ("rpg trade e all", 1, "wooden log", 675),
+        ("rpg trade a all", 960, "wooden log", 2880),
+        ("rpg trade d all", 3560, "apple", 445),
+    ]
+    assert result.final == {"apple": 445}
+
+
+def test_area_9():
+    result = plan(9, {"ruby": 2, "banana": 1, "apple": 3, "wooden log": 1})
+    assert steps(result) == [
+        ("rpg dismantle banana all", 1, "apple", 12),
+        ("rpg trade e all", 2, "wooden log", 1700),
+        ("rpg trade c all", 15, "wooden log", 180),
+        ("rpg trade b all", 1880, "normie fish", 940),
+    ]
+    assert result.final == {"wooden log": 1, "normie fish": 940}
+
+
+def test_area_10():
+    result = plan(10, {"banana": 1})
+    assert steps(result) == [
+        ("rpg dismantle banana all", 1, "apple", 12),
+        ("rpg trade c all", 12, "wooden log", 144),
+    ]
+    assert result.final == {"wooden log": 144}
+
+
+def test_area_11():
+    result = plan(11, {"ruby": 3})
+    assert steps(result) == [("rpg trade e all", 3, "wooden log", 1500)]
+    assert result.final == {"wooden log": 1500}
+
+
+def test_area_12_has_nothing_to_do():
+    result = plan(12, {"wooden log": 50, "ruby": 2})
+    assert result.steps == []
+    assert result.final == {"wooden log": 50, "ruby": 2}
+
+
+def test_area_15_trades_back_to_logs_without_rates():
+    # No ratios for area 15: the trades are still planned, their yield is unknown
+    result = plan(15, {"banana": 1, "golden fish": 1, "ruby": 2, "normie fish": 3})
+    assert steps(result) == [
+        ("rpg dismantle golden fish all", 1, "normie fish", 12),
+        ("rpg dismantle banana all", 1, "apple", 12),
+        ("rpg trade e all", 2, "wooden log", None),
+        ("rpg trade a all", 15, "wooden log", None),
+    ]
+    assert result.final == {"apple": 12, "wooden log": None}
+
+
+def test_nothing_to_trade_skips_steps():
+    assert plan(15, {}).steps == []
+    assert plan(2, {"wooden log": 0}).steps == []
+
+
+def test_format_amount():
+    assert format_amount(1234567) == "1,234,567"
+    assert format_amount(None) == "?"
@@ -0,0 +1,44 @@
+class AuthResolver:
+    """Answers "is this member a moderator?" for the gated commands.
+
+    A moderator has Manage Channels, owns the guild, or has the configured
+    moderator role. The role ID set is taken from the compiled config and only
+    re-read when its version changes. Decisions are cached per (guild, member)
+    and dropped by the SquadronManager listeners when the member's roles or a
+    role's permissions change.
+    """
+
+    def __init__(self):
+        self.config_version = None
+        self.mod_role_ids = frozenset()
+        # (guild id, member id) -> bool
+        self.decisions = {}
+
+    def is_mod(self, member, config):
+        if config.version != self.config_version:
+            self.config_version = config.version
+            self.mod_role_ids = frozenset(rid for rid in (config.moderator_role_id,) if rid)
+            self.decisions.clear()
+
+        key = (member.guild.id, member.id)
+        decision = self.decisions.get(key)
+        if decision is None:
+            decision = (
+                member.id == member.guild.owner_id
+                or member.guild_permissions.manage_channels
+                or not self.mod_role_ids.isdisjoint(role.id for role in member.roles)
+            )
+            self.decisions[key] = decision
+        return decision
+
+    def is_mod_or_owner(self, member, squad, config):
+        return squad.owner_id == member.id or self.is_mod(member, config)
+
+    # --- INVALIDATION ---
+    def forget_member(self, guild_id, member_id):
+        self.decisions.pop((guild_id, member_id), None)
+
+    def forget_guild(self, guild_id):
+        # A role's permissions changed, any member holding it may be affected
+        for key in [key for key in self.decisions if key[0] == guild_id]:
+            del self.decisions[key]
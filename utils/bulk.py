@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import time
+
+
+class BulkJob:
+    """A bulk operation over many squadron channels, saved to disk as it goes.
+
+    `pending` only loses a channel once its operation finished, so a job
+    that gets interrupted (restart, cog reload, ?bulk cancel) can be picked
+    up again from the file without redoing the channels already done.
+    """
+
+    def __init__(self, action, pending, arg=None, done=0, skipped=0, failed=None, status=None):
+        self.action = action
+        self.arg = arg
+        self.pending = list(pending)
+        self.done = done
+        self.skipped = skipped
+        self.failed = failed or []
+        # (channel id, message id) of the status message being edited
+        self.status = status
+
+    @property
+    def total(self):
+        return len(self.pending) + self.done + self.skipped + len(self.failed)
+
+    def progress_text(self, finished=False):
+        header = "✅ **Bulk {0} finished.**" if finished else "⏳ **Bulk {0} running...**"
+        return (
+            f"{header.format(self.action)}\n"
+            f"Progress: **{self.done + self.skipped + len(self.failed)}/{self.total}** "
+            f"(✅ {self.done} | ⏭️ {self.skipped} skipped | ❌ {len(self.failed)} failed)"
+        )
+
+    # --- PERSISTENCE ---
+    def to_dict(self):
+        return {
+            "action": self.action,
+            "arg": self.arg,
+            "pending": self.pending,
+            "done": self.done,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "status": self.status,
+        }
+
+    @classmethod
+    def from_dict(cls, raw):
+        return cls(
+            raw["action"], raw["pending"], raw.get("arg"), raw.get("done", 0),
+            raw.get("skipped", 0), raw.get("failed", []), raw.get("status")
+        )
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+
+async def run_bulk(job, operation, concurrency=5, on_progress=None, checkpoint=None, interval=3.0):
+    """Runs `operation(channel_id)` for every pending channel, at most `concurrency` at a time.
+
+    `operation` returns False when the channel was skipped. `on_progress`
+    and `checkpoint` are called at most once per `interval` seconds while the
+    job runs and once more at the end (also when cancelled), so a 500 channel
+    job edits its status message and rewrites its file a few dozen times,
+    not 500.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    remaining = set(job.pending)
+    last_report = time.monotonic()
+
+    async def report(final=False):
+        nonlocal last_report
+        job.pending = [cid for cid in job.pending if cid in remaining]
+        last_report = time.monotonic()
+        if checkpoint:
+            checkpoint(job)
+        if on_progress:
+            try:
+                await on_progress(job, final)
+            except Exception as e:
+                print(f"⚠️ Bulk progress update failed: {e}")
+
+    async def run_one(channel_id):
+        async with semaphore:
+            try:
+                result = await operation(channel_id)
+            except Exception as e:
+                print(f"⚠️ Bulk {job.action} failed for {channel_id}: {e}")
+                job.failed.append(channel_id)
+            else:
+                if result is False:
+                    job.skipped += 1
+                else:
+                    job.done += 1
+            remaining.discard(channel_id)
+
+            if time.monotonic() - last_report >= interval:
+                await report()
+
+    try:
+        # Cancelling the gather cancels every run_one still waiting on the semaphore
+        await asyncio.gather(*(run_one(channel_id) for channel_id in list(job.pending)), return_exceptions=True)
+    finally:
+        # Runs on cancellation too, so the file always matches what was actually done
+        await asyncio.shield(report(final=not remaining))
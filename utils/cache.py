@@ -0,0 +1,110 @@
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Small bounded mapping that evicts the least recently used entry."""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value = self._items.get(key, self._MISSING)
+        if value is self._MISSING:
+            self.misses += 1
+            return default
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._items.pop(key, default)
+
+    def clear(self):
+        self._items.clear()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+class TTLCache:
+    """Bounded set of keys that expire after `ttl` seconds.
+
+    Entries are kept in insertion order, so expired ones are dropped from the
+    front as new keys come in and every operation stays O(1) amortized. Once
+    `maxsize` is reached the oldest key is evicted even if it hasn't expired.
+    """
+
+    def __init__(self, maxsize=4096, ttl=600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        # key -> expiry timestamp
+        self._expiry = OrderedDict()
+
+    def add(self, key, ttl=None):
+        """Adds the key and returns True, or returns False if it is already present."""
+        now = self.clock()
+        self._evict_expired(now)
+
+        expires = self._expiry.get(key)
+        if expires is not None and expires > now:
+            return False
+
+        self._expiry.pop(key, None)
+        self._expiry[key] = now + (self.ttl if ttl is None else ttl)
+        if len(self._expiry) > self.maxsize:
+            self._expiry.popitem(last=False)
+        return True
+
+    def __contains__(self, key):
+        expires = self._expiry.get(key)
+        return expires is not None and expires > self.clock()
+
+    def discard(self, key):
+        self._expiry.pop(key, None)
+
+    def _evict_expired(self, now):
+        while self._expiry:
+            key, expires = next(iter(self._expiry.items()))
+            if expires > now:
+                break
+            del self._expiry[key]
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+class RenderCache(LRUCache):
+    """LRU of rendered objects (embeds) keyed by entity, each tagged with a version.
+
+    A lookup with a different version than the stored one counts as a miss
+    and the new render replaces the old one, so bumping an entity's version
+    on mutation is all the invalidation needed.
+    """
+
+    def render(self, entity, version, build):
+        cached = self.get(entity)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if cached is not None:
+            # Stale version, get() counted it as a hit
+            self.hits -= 1
+            self.misses += 1
+        value = build()
+        self[entity] = (version, value)
+        return value
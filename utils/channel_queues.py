@@ -0,0 +1,41 @@
+from contextlib import asynccontextmanager
+import asyncio
+
+
+class ChannelQueues:
+    """Serializes work per channel while different channels run in parallel.
+
+    Each channel gets a FIFO lock, so event start/end handling and manual
+    commands like ?hide for the same channel run one after another in
+    arrival order. A channel's entry is dropped as soon as nothing is
+    running or waiting on it, so idle channels cost no memory.
+    """
+
+    def __init__(self):
+        self._slots = {}
+
+    @asynccontextmanager
+    async def hold(self, channel_id):
+        slot = self._slots.get(channel_id)
+        if slot is None:
+            slot = self._slots[channel_id] = _Slot()
+        slot.users += 1
+        try:
+            async with slot.lock:
+                yield
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                del self._slots[channel_id]
+
+    def __len__(self):
+        return len(self._slots)
+
+
+class _Slot:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        # asyncio.Lock wakes waiters in FIFO order, which keeps the per-channel order
+        self.lock = asyncio.Lock()
+        self.users = 0
@@ -0,0 +1,48 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledConfig:
+    """Read-only snapshot of the global config in the shape the hot paths need.
+
+    Built once per config change (see Bot.refresh_config) instead of walking
+    ServerConfig on every RPG bot message. `version` goes up by one each
+    rebuild so anything caching off the config can tell it is stale.
+    """
+
+    version: int = 0
+    # The RPG bots whose messages are checked for events
+    bot_ids: frozenset = frozenset()
+    # event -> (role mention, announcement message)
+    events: dict = field(default_factory=dict)
+    # Roles every squadron channel lets in
+    rpg_role_id: int = None
+    moderator_role_id: int = None
+
+    def role_ping(self, event_type):
+        entry = self.events.get(event_type)
+        return entry[0] if entry else "@everyone"
+
+    def event_message(self, event_type):
+        entry = self.events.get(event_type)
+        if entry and entry[1]:
+            return entry[1]
+        return f"⚠️ {event_type.upper()} started!"
+
+
+def compile_config(cfg, version):
+    """Builds a CompiledConfig from a ServerConfig."""
+    role_ids = {event: role_id for event, role_id in cfg.roles.items() if role_id}
+    events = {}
+    for event in set(role_ids) | set(cfg.event_configs):
+        role_id = role_ids.get(event)
+        details = cfg.event_configs.get(event)
+        events[event] = (f"<@&{role_id}>" if role_id else "@everyone", details.msg if details else "")
+
+    return CompiledConfig(
+        version=version,
+        bot_ids=frozenset(bot_id for bot_id in (cfg.epic_rpg_id, cfg.idle_farm_id) if bot_id is not None),
+        events=events,
+        rpg_role_id=cfg.epic_rpg_role_id,
+        moderator_role_id=cfg.moderator_role_id,
+    )
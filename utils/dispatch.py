@@ -0,0 +1,33 @@
+import asyncio
+import traceback
+
+# Seconds a single cog handler may take before it is cancelled
+HANDLER_TIMEOUT = 15.0
+
+
+async def dispatch(handlers, *args, timeout=HANDLER_TIMEOUT):
+    """Runs independent handlers concurrently.
+
+    Every handler gets its own timeout and its exceptions are printed and
+    swallowed, so a slow or broken cog can't delay or kill the others.
+    """
+    if not handlers:
+        return
+    if len(handlers) == 1:
+        # Skip the task overhead for the common single-handler case
+        await _run_isolated(handlers[0], args, timeout)
+        return
+
+    # gather/wait_for instead of TaskGroup/asyncio.timeout, those need Python 3.11
+    await asyncio.gather(*(_run_isolated(handler, args, timeout) for handler in handlers), return_exceptions=True)
+
+
+async def _run_isolated(handler, args, timeout):
+    name = getattr(handler, "__qualname__", repr(handler))
+    try:
+        await asyncio.wait_for(handler(*args), timeout)
+    except asyncio.TimeoutError:
+        print(f"⏱️ Handler {name} timed out after {timeout:.1f}s")
+    except Exception as e:
+        print(f"❌ Handler {name} raised an exception: {e}")
+        traceback.print_exc()
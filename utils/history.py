@@ -0,0 +1,334 @@
+from array import array
+import base64
+import bisect
+import json
+import os
+import time
+
+# Raw rows older than this are dropped; their numbers live on in the aggregates
+RAW_RETENTION = 7 * 24 * 3600
+# Bit set on the event code of an end row
+END_FLAG = 0x8000
+
+
+def _encode(column):
+    return base64.b64encode(column.tobytes()).decode()
+
+
+def _decode(text):
+    column = array("I")
+    column.frombytes(base64.b64decode(text))
+    return column
+
+
+class Dense:
+    """Named uint32 columns over consecutive slots (hours or days) sharing one base slot.
+
+    Columns grow on either side as slots come in and can be trimmed from the
+    front. Window totals are slice sums, which run in C.
+    """
+
+    __slots__ = ("base", "length", "columns")
+
+    def __init__(self):
+        self.base = None
+        self.length = 0
+        self.columns = {}
+
+    def add(self, key, slot, amount):
+        if not amount:
+            return
+        index = self._index(slot)
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = array("I", bytes(4 * self.length))
+        column[index] += amount
+
+    def _index(self, slot):
+        if self.base is None:
+            self.base = slot
+        if slot < self.base:
+            pad = bytes(4 * (self.base - slot))
+            for column in self.columns.values():
+                column[0:0] = array("I", pad)
+            self.length += self.base - slot
+            self.base = slot
+        index = slot - self.base
+        if index >= self.length:
+            pad = bytes(4 * (index + 1 - self.length))
+            for column in self.columns.values():
+                column.frombytes(pad)
+            self.length = index + 1
+        return index
+
+    def bounds(self, first, last):
+        """Index range [lo, hi) of the slots in the window (first=None means from the start)."""
+        if self.base is None:
+            return 0, 0
+        lo = max(first - self.base, 0) if first is not None else 0
+        hi = min(last - self.base + 1, self.length)
+        return lo, max(hi, lo)
+
+    def total(self, key, first, last):
+        column = self.columns.get(key)
+        if column is None:
+            return 0
+        lo, hi = self.bounds(first, last)
+        return sum(column[lo:hi])
+
+    def trim(self, before):
+        """Drops every slot older than `before`."""
+        if self.base is None or before <= self.base:
+            return
+        drop = min(before - self.base, self.length)
+        for column in self.columns.values():
+            del column[:drop]
+        self.length -= drop
+        self.base = before if not self.length else self.base + drop
+
+    def to_dict(self):
+        return {"base": self.base, "length": self.length,
+                "columns": {key: _encode(column) for key, column in self.columns.items()}}
+
+    @classmethod
+    def from_dict(cls, raw):
+        dense = cls()
+        dense.base = raw["base"]
+        dense.length = raw["length"]
+        dense.columns = {key: _decode(text) for key, text in raw["columns"].items()}
+        return dense
+
+
+class Rollup:
+    """Start/duration counters for one scope (the whole server or one channel).
+
+    Hours within RAW_RETENTION are counted per hour; anything older only
+    per day, plus starts per hour of day for the busiest hours. The hourly
+    part always begins on a whole day, so a query takes hours from `hours`
+    and the days before them from `days` without overlap.
+    """
+
+    __slots__ = ("hours", "days", "codes")
+
+    def __init__(self):
+        self.hours = Dense()
+        self.days = Dense()
+        # Event codes seen in this scope
+        self.codes = set()
+
+    def add(self, code, hour, starts, duration, timed):
+        self.codes.add(code)
+        if self.hours.base is None or hour < self.hours.base:
+            self.hours._index(hour // 24 * 24)
+        for dense, slot in ((self.hours, hour), (self.days, hour // 24)):
+            dense.add(f"starts:{code}", slot, starts)
+            dense.add(f"durations:{code}", slot, duration)
+            dense.add(f"timed:{code}", slot, timed)
+        self.hours.add("all", hour, starts)
+        self.days.add(f"hod:{hour % 24}", hour // 24, starts)
+
+    def query(self, first_hour, last_hour):
+        """(starts, durations, timed ends) per code and starts per hour of day in the window."""
+        hours, days = self.hours, self.days
+        split = hours.base if hours.base is not None else last_hour + 1
+        sources = [(hours, split if first_hour is None else max(first_hour, split), last_hour)]
+        by_hour = [0] * 24
+        if first_hour is None or first_hour < split:
+            first_day = first_hour // 24 if first_hour is not None else None
+            last_day = split // 24 - 1
+            sources.append((days, first_day, last_day))
+            for h in range(24):
+                by_hour[h] += days.total(f"hod:{h}", first_day, last_day)
+
+        totals = {}
+        for code in self.codes:
+            totals[code] = tuple(
+                sum(dense.total(f"{name}:{code}", first, last) for dense, first, last in sources)
+                for name in ("starts", "durations", "timed")
+            )
+
+        # One strided slice sum per hour of day over the hourly part
+        column = hours.columns.get("all")
+        if column is not None:
+            _, first, last = sources[0]
+            lo, hi = hours.bounds(first, last)
+            for offset in range(min(24, hi - lo)):
+                by_hour[(hours.base + lo + offset) % 24] += sum(column[lo + offset:hi:24])
+        return totals, by_hour
+
+    def to_dict(self):
+        return {"hours": self.hours.to_dict(), "days": self.days.to_dict(), "codes": sorted(self.codes)}
+
+    @classmethod
+    def from_dict(cls, raw):
+        rollup = cls()
+        rollup.hours = Dense.from_dict(raw["hours"])
+        rollup.days = Dense.from_dict(raw["days"])
+        rollup.codes = set(raw["codes"])
+        return rollup
+
+
+class EventHistory:
+    """Compact columnar log of event starts and ends.
+
+    Every row is four parallel array entries: a uint32 timestamp, a uint16
+    event code (high bit set for ends), a uint32 channel index and a uint16
+    duration in seconds (ends only), about 12 bytes per event. Raw rows are
+    trimmed after RAW_RETENTION. What stats() needs is kept in a Rollup for
+    the server and one per channel, updated on every record. Their size
+    follows elapsed time, not traffic, and a query is a few slice sums per
+    event whatever the window.
+    """
+
+    def __init__(self):
+        self.timestamps = array("I")
+        self.codes = array("H")
+        self.channels = array("I")
+        self.durations = array("H")
+
+        self.event_names = []
+        self.event_codes = {}
+        self.channel_ids = []
+        self.channel_index = {}
+
+        self.server = Rollup()
+        # channel index -> Rollup
+        self.channel_rollups = {}
+        # (channel index, code) -> start timestamp of the event currently running
+        self.open_events = {}
+
+    # --- INTERNING ---
+    def _code(self, event_type):
+        code = self.event_codes.get(event_type)
+        if code is None:
+            code = self.event_codes[event_type] = len(self.event_names)
+            self.event_names.append(event_type)
+        return code
+
+    def _channel(self, channel_id):
+        index = self.channel_index.get(channel_id)
+        if index is None:
+            index = self.channel_index[channel_id] = len(self.channel_ids)
+            self.channel_ids.append(channel_id)
+        return index
+
+    # --- RECORDING ---
+    def record(self, channel_id, event_type, ending, ts=None):
+        ts = int(ts if ts is not None else time.time())
+        code = self._code(event_type)
+        chan = self._channel(channel_id)
+
+        duration = 0
+        if ending:
+            started = self.open_events.pop((chan, code), None)
+            if started is not None:
+                duration = min(max(ts - started, 0), 0xFFFF)
+        else:
+            self.open_events[(chan, code)] = ts
+
+        self.timestamps.append(ts)
+        self.codes.append(code | END_FLAG if ending else code)
+        self.channels.append(chan)
+        self.durations.append(duration)
+
+        if ending:
+            self._aggregate(chan, code, ts // 3600, 0, duration, 1 if duration else 0)
+        else:
+            self._aggregate(chan, code, ts // 3600, 1, 0, 0)
+
+    def _aggregate(self, chan, code, hour, starts, duration, timed):
+        if not (starts or timed):
+            return
+        channel = self.channel_rollups.get(chan)
+        if channel is None:
+            channel = self.channel_rollups[chan] = Rollup()
+        self.server.add(code, hour, starts, duration, timed)
+        channel.add(code, hour, starts, duration, timed)
+
+    def rollup(self, now=None):
+        """Drops raw rows and hourly counters past RAW_RETENTION (they are already in the daily ones)."""
+        cutoff = int((now if now is not None else time.time()) - RAW_RETENTION)
+        keep_from = bisect.bisect_left(self.timestamps, cutoff)
+        if keep_from:
+            for column in (self.timestamps, self.codes, self.channels, self.durations):
+                del column[:keep_from]
+        # Trimmed on whole days so the hourly and daily parts of a query never overlap
+        first_kept = (cutoff // 86400) * 24
+        for scope in (self.server, *self.channel_rollups.values()):
+            scope.hours.trim(first_kept)
+        return keep_from
+
+    # --- QUERIES ---
+    def stats(self, channel_id=None, window=None, now=None):
+        """Counts, average duration and busiest UTC hours over the last `window` seconds.
+
+        Windows reaching past RAW_RETENTION start at the beginning of that UTC day.
+        """
+        now = now if now is not None else time.time()
+        first_hour = int((now - window) // 3600) if window else None
+        if channel_id is None:
+            scope = self.server
+        else:
+            scope = self.channel_rollups.get(self.channel_index.get(channel_id))
+            if scope is None:
+                return self._result({}, [0] * 24)
+        return self._result(*scope.query(first_hour, int(now // 3600)))
+
+    def _result(self, totals, by_hour):
+        busiest = sorted((h for h in range(24) if by_hour[h]), key=lambda h: by_hour[h], reverse=True)[:3]
+        return {
+            "counts": {self.event_names[code]: starts for code, (starts, _, _) in totals.items() if starts},
+            "avg_duration": {self.event_names[code]: duration / timed for code, (_, duration, timed) in totals.items() if timed},
+            "busiest_hours": [(h, by_hour[h]) for h in busiest],
+        }
+
+    # --- PERSISTENCE ---
+    def to_dict(self):
+        return {
+            "event_names": list(self.event_names),
+            "channel_ids": list(self.channel_ids),
+            "columns": {
+                name: _encode(column)
+                for name, column in (("timestamps", self.timestamps), ("codes", self.codes),
+                                     ("channels", self.channels), ("durations", self.durations))
+            },
+            "server": self.server.to_dict(),
+            "channel_rollups": {str(c): rollup.to_dict() for c, rollup in self.channel_rollups.items()},
+            "open_events": [[c, code, ts] for (c, code), ts in self.open_events.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, raw):
+        history = cls()
+        history.event_names = raw["event_names"]
+        history.event_codes = {name: code for code, name in enumerate(history.event_names)}
+        history.channel_ids = raw["channel_ids"]
+        history.channel_index = {cid: index for index, cid in enumerate(history.channel_ids)}
+        for name, column in (("timestamps", history.timestamps), ("codes", history.codes),
+                             ("channels", history.channels), ("durations", history.durations)):
+            column.frombytes(base64.b64decode(raw["columns"][name]))
+        history.open_events = {(c, code): ts for c, code, ts in raw["open_events"]}
+        history.server = Rollup.from_dict(raw["server"])
+        history.channel_rollups = {int(c): Rollup.from_dict(rollup) for c, rollup in raw["channel_rollups"].items()}
+        return history
+
+    def save(self, path):
+        self.write(path, self.to_dict())
+
+    @staticmethod
+    def write(path, payload):
+        """Writes a to_dict() payload. Safe in a worker thread, it never touches the live history."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def __len__(self):
+        return len(self.timestamps)
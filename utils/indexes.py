@@ -0,0 +1,66 @@
+class SquadIndex:
+    """Reverse lookups over the squadrons dict.
+
+    user_squads maps a user ID (owner or member) to the channel IDs of their
+    squadrons and owner_squad maps an owner ID to the channel they own, so
+    `?squad` and `?create` don't have to scan every squadron. All IDs are
+    stored as ints, keyed the same way as BotData.squadrons.
+    """
+
+    def __init__(self):
+        self.user_squads = {}
+        self.owner_squad = {}
+
+    def rebuild(self, squadrons):
+        self.user_squads = {}
+        self.owner_squad = {}
+        for channel_id, squad in squadrons.items():
+            self.add_squad(channel_id, squad)
+
+    # --- LOOKUPS ---
+    def squads_for(self, user_id):
+        return self.user_squads.get(int(user_id), set())
+
+    def owned_by(self, user_id):
+        return self.owner_squad.get(int(user_id))
+
+    # --- INCREMENTAL UPDATES ---
+    def add_squad(self, channel_id, squad):
+        channel_id = int(channel_id)
+        self.owner_squad[squad.owner_id] = channel_id
+        self._link(squad.owner_id, channel_id)
+        for uid in squad.members:
+            self._link(uid, channel_id)
+
+    def remove_squad(self, channel_id, squad):
+        channel_id = int(channel_id)
+        if self.owner_squad.get(squad.owner_id) == channel_id:
+            del self.owner_squad[squad.owner_id]
+        self._unlink(squad.owner_id, channel_id)
+        for uid in squad.members:
+            self._unlink(uid, channel_id)
+
+    def add_member(self, channel_id, user_id):
+        self._link(user_id, int(channel_id))
+
+    def remove_member(self, channel_id, user_id):
+        self._unlink(user_id, int(channel_id))
+
+    def set_owner(self, channel_id, old_owner_id, new_owner_id):
+        # The old owner stays in the squadron as a member, so only the owner map changes
+        channel_id = int(channel_id)
+        if self.owner_squad.get(int(old_owner_id)) == channel_id:
+            del self.owner_squad[int(old_owner_id)]
+        self.owner_squad[int(new_owner_id)] = channel_id
+        self._link(new_owner_id, channel_id)
+
+    def _link(self, user_id, channel_id):
+        self.user_squads.setdefault(int(user_id), set()).add(channel_id)
+
+    def _unlink(self, user_id, channel_id):
+        channels = self.user_squads.get(int(user_id))
+        if channels is None:
+            return
+        channels.discard(channel_id)
+        if not channels:
+            del self.user_squads[int(user_id)]
@@ -0,0 +1,20 @@
+import re
+
+# Every "**item name**: 1,234" pair in an EPIC RPG inventory embed, matched in one pass
+ITEM_PATTERN = re.compile(r"\*\*([^*\n]+?)\*\*:\s*([\d,]+)")
+
+
+def parse_inventory(text):
+    """Returns {item name (lowercase): count} for every item in the text."""
+    return {
+        name.strip().lower(): int(count.replace(",", ""))
+        for name, count in ITEM_PATTERN.findall(text)
+    }
+
+
+def parse_inventory_embed(embed):
+    """Parses all fields of an inventory embed into one item -> count mapping."""
+    items = {}
+    for field in embed.fields:
+        items.update(parse_inventory(field.value))
+    return items
@@ -0,0 +1,224 @@
+from dataclasses import dataclass, field, fields, replace
+
+# Bump this and add a function to MIGRATIONS whenever the stored layout changes
+SCHEMA_VERSION = 2
+
+
+def _to_int(value):
+    return int(value) if value not in (None, "") else None
+
+
+def _assign(target, source):
+    # Copies every field over, so references to `target` held elsewhere see the new values
+    for f in fields(target):
+        setattr(target, f.name, getattr(source, f.name))
+
+
+@dataclass(slots=True)
+class Squadron:
+    owner_id: int
+    members: list = field(default_factory=list)
+    events_enabled: bool = True
+    squad_only_mode: bool = False
+    active_events: list = field(default_factory=list)
+    is_hidden: bool = True
+    # event -> unix timestamp when an active event is considered stuck
+    event_deadlines: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, raw):
+        return cls(
+            owner_id=int(raw["owner_id"]),
+            members=[int(uid) for uid in raw.get("members", [])],
+            events_enabled=bool(raw.get("events_enabled", True)),
+            squad_only_mode=bool(raw.get("squad_only_mode", False)),
+            active_events=list(raw.get("active_events", [])),
+            is_hidden=bool(raw.get("is_hidden", True)),
+            event_deadlines={event: float(deadline) for event, deadline in raw.get("event_deadlines", {}).items()},
+        )
+
+    def to_dict(self):
+        return {
+            "owner_id": self.owner_id,
+            "members": list(self.members),
+            "events_enabled": self.events_enabled,
+            "squad_only_mode": self.squad_only_mode,
+            "active_events": list(self.active_events),
+            "is_hidden": self.is_hidden,
+            "event_deadlines": dict(self.event_deadlines),
+        }
+
+
+@dataclass(slots=True)
+class EventConfig:
+    role: int = None
+    msg: str = ""
+
+    @classmethod
+    def from_dict(cls, raw):
+        return cls(role=_to_int(raw.get("role")), msg=raw.get("msg", ""))
+
+    def to_dict(self):
+        return {"role": self.role, "msg": self.msg}
+
+
+@dataclass(slots=True)
+class ServerConfig:
+    epic_rpg_id: int = None
+    idle_farm_id: int = None
+    epic_rpg_role_id: int = None
+    moderator_role_id: int = None
+    category_id: int = None
+    roles: dict = field(default_factory=dict)
+    event_configs: dict = field(default_factory=dict)
+    # Keys we don't model are kept so saving never drops them
+    extra: dict = field(default_factory=dict)
+
+    # attribute name -> key in squadrons_data.json
+    ID_KEYS = {
+        "epic_rpg_id": "EPIC_RPG_ID",
+        "idle_farm_id": "IDLE_FARM_ID",
+        "epic_rpg_role_id": "EPIC_RPG_ROLE_ID",
+        "moderator_role_id": "MODERATOR_ROLE_ID",
+        "category_id": "CATEGORY_ID",
+    }
+
+    @classmethod
+    def from_dict(cls, raw):
+        raw = dict(raw)
+        cfg = cls()
+        for attr, key in cls.ID_KEYS.items():
+            setattr(cfg, attr, _to_int(raw.pop(key, None)))
+        cfg.roles = {event: _to_int(role_id) for event, role_id in raw.pop("roles", {}).items()}
+        cfg.event_configs = {event: EventConfig.from_dict(details) for event, details in raw.pop("event_configs", {}).items()}
+        cfg.extra = raw
+        return cfg
+
+    def to_dict(self):
+        raw = dict(self.extra)
+        for attr, key in self.ID_KEYS.items():
+            value = getattr(self, attr)
+            if value is not None:
+                raw[key] = value
+        if self.roles:
+            raw["roles"] = dict(self.roles)
+        if self.event_configs:
+            raw["event_configs"] = {event: details.to_dict() for event, details in self.event_configs.items()}
+        return raw
+
+
+@dataclass(slots=True)
+class BotData:
+    squadrons: dict = field(default_factory=dict)
+    server_configs: dict = field(default_factory=lambda: {"global": ServerConfig()})
+
+    @property
+    def config(self):
+        """The global server config, which is the only scope the bot uses."""
+        return self.server_configs.setdefault("global", ServerConfig())
+
+    @classmethod
+    def from_dict(cls, raw):
+        return cls(
+            squadrons={int(cid): Squadron.from_dict(info) for cid, info in raw.get("squadrons", {}).items()},
+            server_configs={scope: ServerConfig.from_dict(cfg) for scope, cfg in raw.get("server_configs", {}).items()},
+        )
+
+    def apply(self, new):
+        """Updates this object in place to match `new` and returns what changed.
+
+        Unchanged squadrons and configs are left alone (same objects, no
+        notifications), so callers only pay for what actually differs.
+        """
+        diff = DataDiff()
+        for cid, squad in self.squadrons.items():
+            if cid not in new.squadrons:
+                diff.removed[cid] = squad
+        for cid in diff.removed:
+            del self.squadrons[cid]
+
+        for cid, squad in new.squadrons.items():
+            current = self.squadrons.get(cid)
+            if current is None:
+                self.squadrons[cid] = squad
+                diff.added[cid] = squad
+            elif current != squad:
+                # Fields are reassigned, not mutated, so the shallow copy keeps the old lists
+                diff.changed[cid] = (replace(current), current)
+                _assign(current, squad)
+
+        for scope in set(self.server_configs) | set(new.server_configs):
+            current = self.server_configs.get(scope)
+            incoming = new.server_configs.get(scope)
+            if current == incoming:
+                continue
+            diff.config_scopes.add(scope)
+            if incoming is None:
+                del self.server_configs[scope]
+            elif current is None:
+                self.server_configs[scope] = incoming
+            else:
+                _assign(current, incoming)
+        return diff
+
+    def to_dict(self):
+        return {
+            "schema_version": SCHEMA_VERSION,
+            "server_configs": {scope: cfg.to_dict() for scope, cfg in self.server_configs.items()},
+            "squadrons": {str(cid): squad.to_dict() for cid, squad in self.squadrons.items()},
+        }
+
+
+@dataclass(slots=True)
+class DataDiff:
+    """What BotData.apply changed, handed to everything that derives state from the data."""
+    added: dict = field(default_factory=dict)
+    # channel ID -> the squadron as it was before removal
+    removed: dict = field(default_factory=dict)
+    # channel ID -> (copy from before the reload, live squadron)
+    changed: dict = field(default_factory=dict)
+    config_scopes: set = field(default_factory=set)
+    # Squadrons (and the config) left as they were because their save hadn't reached disk yet
+    kept: int = 0
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed or self.config_scopes)
+
+    def summary(self):
+        return (f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed"
+                f"{', config changed' if self.config_scopes else ''}"
+                f"{f', {self.kept} unsaved changes kept' if self.kept else ''}")
+
+
+# --- MIGRATIONS ---
+# Each function upgrades the raw JSON dict from version N to N + 1
+def _add_is_hidden(raw):
+    for info in raw.get("squadrons", {}).values():
+        info.setdefault("is_hidden", True)
+
+
+def _normalize_ids(raw):
+    # Older versions stored some IDs as strings, everything is an int from v2 on
+    for info in raw.get("squadrons", {}).values():
+        info["owner_id"] = int(info["owner_id"])
+        info["members"] = [int(uid) for uid in info.get("members", [])]
+
+
+MIGRATIONS = {
+    0: _add_is_hidden,
+    1: _normalize_ids,
+}
+
+
+def load_data(raw):
+    """Migrates a raw dict if needed and builds the typed model.
+
+    Returns (data, migrated) so the caller knows whether to save it back.
+    """
+    version = raw.get("schema_version", 0)
+    migrated = version < SCHEMA_VERSION
+    while version < SCHEMA_VERSION:
+        MIGRATIONS[version](raw)
+        version += 1
+        print(f"🛠️ Migrated data to schema v{version}.")
+    return BotData.from_dict(raw), migrated
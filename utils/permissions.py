@@ -0,0 +1,81 @@
+import time
+
+# How long our own last edit is trusted over the gateway cache
+APPLIED_TTL = 30.0
+
+
+def plan_overwrites(current, desired):
+    """Compares a channel's overwrites with the wanted ones.
+
+    Returns a list of (target, overwrite) changes, where an overwrite of
+    None means the target should be removed. An empty list means the
+    channel is already in the wanted state.
+    """
+    changes = [(target, overwrite) for target, overwrite in desired.items() if current.get(target) != overwrite]
+    changes.extend((target, None) for target in current if target not in desired)
+    return changes
+
+
+class OverwriteTracker:
+    """Remembers the overwrites last applied to each channel until the gateway shows them.
+
+    set_permissions and channel.edit don't touch channel.overwrites, only the
+    CHANNEL_UPDATE that follows does. Until then a plan made against the cache
+    would be made against the state before our own edit, e.g. an unhide right
+    after a hide would look like a no-op. Entries expire after APPLIED_TTL so
+    a missed update can't pin a channel to an old state.
+    """
+
+    def __init__(self, ttl=APPLIED_TTL):
+        self.ttl = ttl
+        # channel id -> (monotonic time applied, overwrites)
+        self.applied = {}
+
+    def current(self, channel):
+        entry = self.applied.get(channel.id)
+        if entry is not None:
+            if time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+            del self.applied[channel.id]
+        return channel.overwrites
+
+    def record(self, channel_id, overwrites):
+        self.applied[channel_id] = (time.monotonic(), dict(overwrites))
+
+    def update(self, channel, target, overwrite):
+        """Records a single set_permissions made outside apply_overwrites."""
+        overwrites = dict(self.current(channel))
+        if overwrite is None:
+            overwrites.pop(target, None)
+        else:
+            overwrites[target] = overwrite
+        self.record(channel.id, overwrites)
+
+    def seen(self, channel):
+        """Called on channel updates, drops the entry once the cache caught up."""
+        entry = self.applied.get(channel.id)
+        if entry is not None and not plan_overwrites(channel.overwrites, entry[1]):
+            del self.applied[channel.id]
+
+    def forget(self, channel_id):
+        self.applied.pop(channel_id, None)
+
+
+async def apply_overwrites(channel, desired, reason=None, tracker=None):
+    """Applies only what differs: nothing, a single set_permissions, or one full edit.
+
+    With a tracker the plan is made against the last applied overwrites
+    instead of a possibly stale cache. Returns the number of REST calls made.
+    """
+    current = tracker.current(channel) if tracker else channel.overwrites
+    changes = plan_overwrites(current, desired)
+    if not changes:
+        return 0
+    if len(changes) == 1:
+        target, overwrite = changes[0]
+        await channel.set_permissions(target, overwrite=overwrite, reason=reason)
+    else:
+        await channel.edit(overwrites=desired, reason=reason)
+    if tracker:
+        tracker.record(channel.id, desired)
+    return 1
@@ -0,0 +1,213 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+# Lower runs first
+PRIORITY_EVENT = 0        # event announcements
+PRIORITY_PERMISSIONS = 1  # squadron hide/unhide/overwrite edits
+PRIORITY_TRADE = 2        # trade helper prompts and other embeds
+PRIORITY_BULK = 3         # admin bulk jobs, only use what's left over
+
+
+class Bucket:
+    """Token bucket for one route: `rate` calls per `per` seconds."""
+
+    __slots__ = ("rate", "per", "tokens", "updated")
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def ready_in(self, now):
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class Operation:
+    __slots__ = ("route", "factory", "priority", "key", "future", "enqueued", "superseded")
+
+    def __init__(self, route, factory, priority, key, future):
+        self.route = route
+        self.factory = factory
+        self.priority = priority
+        self.key = key
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.superseded = False
+
+
+class RestScheduler:
+    """Priority queue in front of outbound Discord REST calls.
+
+    Every call is submitted with a route (e.g. "send:<channel id>") that
+    gets its own token bucket, on top of one global bucket. Event
+    announcements are picked before permission edits, which are picked
+    before trade prompts. Calls submitted with the same coalescing key
+    replace each other while still queued, so a hide queued right after an
+    unhide for the same channel only runs once. That single run computes its
+    overwrites when it executes, so a net no-op makes no REST call at all.
+    """
+
+    def __init__(self, workers=3, route_rate=(5, 5.0), global_rate=(40, 1.0)):
+        self.workers = workers
+        self.route_rate = route_rate
+        self.global_bucket = Bucket(*global_rate)
+        self._buckets = {}
+        self._heap = []
+        self._by_key = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._stopped = False
+        # Queued ops that haven't been superseded, kept as a counter so enqueueing stays O(log n)
+        self._live = 0
+
+        # --- METRICS ---
+        self.executed = 0
+        self.superseded = 0
+        self.failed = 0
+        self.max_depth = 0
+        # priority -> [total wait seconds, calls]
+        self.wait_totals = {}
+
+    def start(self):
+        self._stopped = False
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._stopped = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for _, _, op in self._heap:
+            if not op.future.done():
+                op.future.cancel()
+        self._heap.clear()
+        self._by_key.clear()
+        self._live = 0
+
+    def submit(self, route, factory, priority=PRIORITY_TRADE, key=None):
+        """Queues `factory()` (a coroutine function) and returns a future with its result.
+
+        A superseded call's future resolves to None.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self._stopped:
+            # No workers left to run it (shutdown), don't leave the caller waiting forever
+            future.cancel()
+            return future
+        op = Operation(route, factory, priority, key, future)
+
+        if key is not None:
+            previous = self._by_key.get(key)
+            if previous is not None:
+                previous.superseded = True
+                self.superseded += 1
+                self._live -= 1
+                if not previous.future.done():
+                    previous.future.set_result(None)
+            self._by_key[key] = op
+
+        heapq.heappush(self._heap, (priority, next(self._seq), op))
+        self._live += 1
+        self.max_depth = max(self.max_depth, self._live)
+        self._wakeup.set()
+        return future
+
+    async def run(self, route, factory, priority=PRIORITY_TRADE, key=None):
+        """submit() and wait for the result."""
+        return await self.submit(route, factory, priority, key)
+
+    @property
+    def depth(self):
+        return self._live
+
+    def average_wait(self, priority):
+        total, calls = self.wait_totals.get(priority, (0.0, 0))
+        return total / calls if calls else 0.0
+
+    def _bucket(self, route):
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            bucket = self._buckets[route] = Bucket(*self.route_rate)
+        return bucket
+
+    def _next_ready(self):
+        """Pops the best runnable op, or returns (None, seconds to wait)."""
+        now = time.monotonic()
+        deferred = []
+        chosen = None
+        wait = None
+
+        global_wait = self.global_bucket.ready_in(now)
+        if global_wait > 0:
+            return None, global_wait
+
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            op = entry[2]
+            if op.superseded:
+                continue
+            route_wait = self._bucket(op.route).ready_in(now)
+            if route_wait == 0:
+                chosen = op
+                break
+            # Rate limited route, let lower priority work on other routes go first
+            deferred.append(entry)
+            wait = route_wait if wait is None else min(wait, route_wait)
+
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+
+        if chosen is None:
+            return None, wait
+
+        self._bucket(chosen.route).take(now)
+        self.global_bucket.take(now)
+        self._live -= 1
+        if chosen.key is not None and self._by_key.get(chosen.key) is chosen:
+            del self._by_key[chosen.key]
+        return chosen, 0.0
+
+    async def _worker(self):
+        while True:
+            op, wait = self._next_ready()
+            if op is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            waited = time.monotonic() - op.enqueued
+            total, calls = self.wait_totals.get(op.priority, (0.0, 0))
+            self.wait_totals[op.priority] = (total + waited, calls + 1)
+
+            try:
+                result = await op.factory()
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ REST call on {op.route} failed: {e}")
+                if not op.future.done():
+                    op.future.set_exception(e)
+            else:
+                self.executed += 1
+                if not op.future.done():
+                    op.future.set_result(result)
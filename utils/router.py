@@ -0,0 +1,86 @@
+class MessageRouter:
+    """Routing table that decides which cog handlers see a message.
+
+    Cogs register their handlers when they load, keyed by author ID (the RPG
+    bots), by channel ID (channels with an active session) or by content
+    prefix (`rpg p trd`, `rpg i`, ...). A message that matches none of them
+    is dropped after a couple of dict lookups instead of going through every
+    cog's own string and regex checks.
+    """
+
+    def __init__(self):
+        self.by_author = {}
+        self.by_channel = {}
+        # First two words of the prefix -> [(prefix, route)]
+        self.by_prefix = {}
+
+    # --- REGISTRATION ---
+    def add_author(self, owner, author_id, handler, edits=False):
+        if author_id is not None:
+            self.by_author.setdefault(int(author_id), []).append(Route(owner, handler, edits))
+
+    def add_channel(self, owner, channel_id, handler, edits=False):
+        routes = self.by_channel.setdefault(int(channel_id), [])
+        if not any(r.owner is owner and r.handler == handler for r in routes):
+            routes.append(Route(owner, handler, edits))
+
+    def remove_channel(self, owner, channel_id):
+        routes = self.by_channel.get(int(channel_id))
+        if routes is None:
+            return
+        routes[:] = [r for r in routes if r.owner is not owner]
+        if not routes:
+            del self.by_channel[int(channel_id)]
+
+    def add_prefix(self, owner, prefix, handler, edits=False):
+        # Prefixes are matched against the first 32 characters of the message
+        prefix = prefix.lower()
+        self.by_prefix.setdefault(self._prefix_key(prefix), []).append((prefix, Route(owner, handler, edits)))
+
+    def remove_owner(self, owner):
+        """Drops every route a cog registered, used from cog_unload."""
+        for table in (self.by_author, self.by_channel):
+            for key in list(table):
+                table[key] = [r for r in table[key] if r.owner is not owner]
+                if not table[key]:
+                    del table[key]
+        for key in list(self.by_prefix):
+            self.by_prefix[key] = [(p, r) for p, r in self.by_prefix[key] if r.owner is not owner]
+            if not self.by_prefix[key]:
+                del self.by_prefix[key]
+
+    @staticmethod
+    def _prefix_key(text):
+        return " ".join(text.split(None, 2)[:2])
+
+    # --- LOOKUP ---
+    def route(self, message, edit=False):
+        """Returns the handlers interested in this message, in registration order."""
+        matched = []
+        for route in self.by_author.get(message.author.id, ()):
+            matched.append(route)
+        for route in self.by_channel.get(message.channel.id, ()):
+            matched.append(route)
+
+        if self.by_prefix and message.content:
+            head = message.content[:32].lower()
+            for prefix, route in self.by_prefix.get(self._prefix_key(head), ()):
+                if head.startswith(prefix):
+                    matched.append(route)
+
+        handlers = []
+        for route in matched:
+            if edit and not route.edits:
+                continue
+            if route.handler not in handlers:
+                handlers.append(route.handler)
+        return handlers
+
+
+class Route:
+    __slots__ = ("owner", "handler", "edits")
+
+    def __init__(self, owner, handler, edits):
+        self.owner = owner
+        self.handler = handler
+        self.edits = edits
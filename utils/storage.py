@@ -0,0 +1,510 @@
+import asyncio
+import json
+import os
+import sqlite3
+
+from utils.models import SCHEMA_VERSION, BotData, ServerConfig, Squadron, load_data
+
+
+class WriteBehindStore:
+    """Base class for the write-behind storage backends.
+
+    Callers only mark data as dirty. Every save requested inside the flush
+    window is merged into a single write, and the actual I/O happens in a
+    worker thread so the gateway loop never blocks on disk.
+
+    Subclasses implement `load`, `_take_snapshot` (runs on the loop) and
+    `_write` (runs in the worker thread).
+    """
+
+    def __init__(self, path, flush_delay=2.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.data = None
+        # Set by load() when schema migrations ran and the result should be saved back
+        self.migrated = False
+        self._flush_task = None
+        self._inflight = None
+        self._write_lock = asyncio.Lock()
+        # What was marked but isn't on disk yet: squadron IDs, config, everything
+        self._pending = (set(), False, False)
+        # The same for the write currently in flight
+        self._writing = (set(), False, False)
+
+    # --- DIRTY TRACKING ---
+    def mark_dirty(self, data=None):
+        """Schedules a save of everything."""
+        if data is not None:
+            self.data = data
+        squads, config, _ = self._pending
+        self._pending = (squads, config, True)
+        self._mark_all()
+        self._schedule()
+
+    def mark_squad(self, channel_id):
+        """Schedules a save of one squadron (a missing squadron is deleted)."""
+        self._pending[0].add(int(channel_id))
+        self._mark_squad(int(channel_id))
+        self._schedule()
+
+    def mark_config(self):
+        """Schedules a save of the server configs."""
+        squads, _, everything = self._pending
+        self._pending = (squads, True, everything)
+        self._mark_config()
+        self._schedule()
+
+    def pending(self):
+        """(squadron IDs, config, everything) changed in memory but not written yet.
+
+        Includes a write that is still in flight. A reload must keep the live
+        copies of these, the file on disk doesn't have them yet.
+        """
+        (squads, config, everything), (w_squads, w_config, w_everything) = self._pending, self._writing
+        return squads | w_squads, config or w_config, everything or w_everything
+
+    def _schedule(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not on the event loop yet (e.g. migrations during Bot.__init__)
+            self.flush_now()
+            return
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    # --- WRITING ---
+    async def flush(self):
+        async with self._write_lock:
+            if not self.has_pending():
+                return
+            # Snapshot on the loop so the worker thread never sees data that is being mutated
+            snapshot = self._take_snapshot()
+            self._writing, self._pending = self._pending, (set(), False, False)
+            self._inflight = asyncio.ensure_future(asyncio.to_thread(self._write, snapshot))
+            try:
+                # Shielded so a cancelled timer never abandons a half-finished write
+                await asyncio.shield(self._inflight)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._restore_snapshot(snapshot)
+                squads, config, everything = self._writing
+                self._pending = (self._pending[0] | squads, self._pending[1] or config, self._pending[2] or everything)
+                print(f"❌ Failed to save {self.path}: {e}")
+            finally:
+                if self._inflight.done():
+                    self._writing = (set(), False, False)
+
+    def flush_now(self):
+        """Synchronous write, only used when no event loop is running."""
+        if not self.has_pending():
+            return
+        self._write(self._take_snapshot())
+        self._pending = (set(), False, False)
+
+    async def close(self):
+        """Cancels the pending timer and writes whatever is still dirty."""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        if self._inflight and not self._inflight.done():
+            try:
+                await self._inflight
+            except Exception:
+                self._mark_all()
+        await self.flush()
+
+
+class JsonStore(WriteBehindStore):
+    """Write-behind persistence for squadrons_data.json using temp-file-and-rename."""
+
+    def __init__(self, path, flush_delay=2.0):
+        super().__init__(path, flush_delay)
+        self._dirty = False
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.data, self.migrated = load_data(json.load(f))
+        else:
+            self.data, self.migrated = BotData(), False
+        return self.data
+
+    # The JSON file is one document, so any change dirties all of it
+    def _mark_all(self):
+        self._dirty = True
+
+    def _mark_squad(self, channel_id):
+        self._dirty = True
+
+    def _mark_config(self):
+        self._dirty = True
+
+    def has_pending(self):
+        return self._dirty
+
+    def _take_snapshot(self):
+        self._dirty = False
+        return self.data.to_dict()
+
+    def _restore_snapshot(self, snapshot):
+        self._dirty = True
+
+    def _write(self, snapshot):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class SqliteStore(WriteBehindStore):
+    """SQLite (WAL mode) persistence with one row set per squadron.
+
+    Marking a squadron dirty only rewrites that squadron's rows, so the cost
+    of a save no longer depends on how many squadrons exist.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS squadrons (
+            channel_id INTEGER PRIMARY KEY,
+            owner_id INTEGER NOT NULL,
+            events_enabled INTEGER NOT NULL DEFAULT 1,
+            squad_only_mode INTEGER NOT NULL DEFAULT 0,
+            is_hidden INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE TABLE IF NOT EXISTS squad_members (
+            channel_id INTEGER NOT NULL REFERENCES squadrons(channel_id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (channel_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS active_events (
+            channel_id INTEGER NOT NULL REFERENCES squadrons(channel_id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            deadline REAL,
+            PRIMARY KEY (channel_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS config_values (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (scope, key)
+        );
+        CREATE TABLE IF NOT EXISTS event_configs (
+            scope TEXT NOT NULL,
+            event TEXT NOT NULL,
+            role INTEGER,
+            msg TEXT,
+            PRIMARY KEY (scope, event)
+        );
+    """
+
+    def __init__(self, path, flush_delay=2.0, import_from=None):
+        super().__init__(path, flush_delay)
+        self.import_from = import_from
+        self._dirty_squads = set()
+        self._config_dirty = False
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.SCHEMA)
+        # Databases created before event expiry existed have no deadline column
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(active_events)")}
+        if "deadline" not in columns:
+            self.conn.execute("ALTER TABLE active_events ADD COLUMN deadline REAL")
+
+    def load(self):
+        if self.import_from and self._is_empty() and os.path.exists(self.import_from):
+            self.import_json(self.import_from)
+
+        # The tables are already typed, so only imported JSON goes through the migrations
+        squads = {}
+        for cid, owner, enabled, squad_only, hidden in self.conn.execute(
+            "SELECT channel_id, owner_id, events_enabled, squad_only_mode, is_hidden FROM squadrons"
+        ):
+            squads[cid] = Squadron(
+                owner_id=owner,
+                events_enabled=bool(enabled),
+                squad_only_mode=bool(squad_only),
+                is_hidden=bool(hidden),
+            )
+        for cid, uid in self.conn.execute("SELECT channel_id, user_id FROM squad_members ORDER BY channel_id, position"):
+            squads[cid].members.append(uid)
+        for cid, event, deadline in self.conn.execute(
+            "SELECT channel_id, event, deadline FROM active_events ORDER BY channel_id, position"
+        ):
+            squads[cid].active_events.append(event)
+            if deadline is not None:
+                squads[cid].event_deadlines[event] = deadline
+
+        raw_configs = {}
+        for scope, key, value in self.conn.execute("SELECT scope, key, value FROM config_values"):
+            raw_configs.setdefault(scope, {})[key] = json.loads(value)
+        for scope, event, role, msg in self.conn.execute("SELECT scope, event, role, msg FROM event_configs"):
+            raw_configs.setdefault(scope, {}).setdefault("event_configs", {})[event] = {"role": role, "msg": msg}
+
+        self.data = BotData(squadrons=squads)
+        self.data.server_configs.update({scope: ServerConfig.from_dict(cfg) for scope, cfg in raw_configs.items()})
+        return self.data
+
+    def _is_empty(self):
+        row = self.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM squadrons) + (SELECT COUNT(*) FROM config_values)"
+        ).fetchone()
+        return row[0] == 0
+
+    def import_json(self, json_path):
+        """One-shot import of an existing squadrons_data.json into the database."""
+        with open(json_path, "r") as f:
+            data, _ = load_data(json.load(f))
+        snapshot = {
+            "squads": {cid: self._squad_rows(squad) for cid, squad in data.squadrons.items()},
+            "config": self._config_rows(data.server_configs),
+        }
+        self._write(snapshot)
+        print(f"📥 Imported {len(data.squadrons)} squadrons from {json_path} into {self.path}")
+
+    # --- DIRTY TRACKING ---
+    def _mark_all(self):
+        self._dirty_squads.update(self.data.squadrons.keys())
+        self._config_dirty = True
+
+    def _mark_squad(self, channel_id):
+        self._dirty_squads.add(channel_id)
+
+    def _mark_config(self):
+        self._config_dirty = True
+
+    def has_pending(self):
+        return bool(self._dirty_squads) or self._config_dirty
+
+    def _take_snapshot(self):
+        squads = self.data.squadrons
+        snapshot = {
+            "squads": {cid: self._squad_rows(squads.get(cid)) for cid in self._dirty_squads},
+            "config": self._config_rows(self.data.server_configs) if self._config_dirty else None,
+        }
+        self._dirty_squads = set()
+        self._config_dirty = False
+        return snapshot
+
+    def _restore_snapshot(self, snapshot):
+        self._dirty_squads.update(snapshot["squads"].keys())
+        if snapshot["config"] is not None:
+            self._config_dirty = True
+
+    @staticmethod
+    def _squad_rows(squad):
+        if squad is None:
+            return None
+        return (
+            squad.owner_id,
+            int(squad.events_enabled),
+            int(squad.squad_only_mode),
+            int(squad.is_hidden),
+            list(squad.members),
+            [(event, squad.event_deadlines.get(event)) for event in squad.active_events],
+        )
+
+    @staticmethod
+    def _config_rows(server_configs):
+        values, events = [], []
+        for scope, cfg in server_configs.items():
+            for key, value in cfg.to_dict().items():
+                if key == "event_configs":
+                    for event, details in value.items():
+                        events.append((scope, event, details.get("role"), details.get("msg")))
+                else:
+                    values.append((scope, key, json.dumps(value)))
+        return values, events
+
+    def _write(self, snapshot):
+        with self.conn:
+            for cid, rows in snapshot["squads"].items():
+                if rows is None:
+                    self.conn.execute("DELETE FROM squadrons WHERE channel_id = ?", (cid,))
+                    continue
+
+                owner, enabled, squad_only, hidden, members, events = rows
+                self.conn.execute(
+                    "INSERT INTO squadrons (channel_id, owner_id, events_enabled, squad_only_mode, is_hidden) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT(channel_id) DO UPDATE SET "
+                    "owner_id = excluded.owner_id, events_enabled = excluded.events_enabled, "
+                    "squad_only_mode = excluded.squad_only_mode, is_hidden = excluded.is_hidden",
+                    (cid, owner, enabled, squad_only, hidden),
+                )
+                self.conn.execute("DELETE FROM squad_members WHERE channel_id = ?", (cid,))
+                self.conn.executemany(
+                    "INSERT INTO squad_members (channel_id, position, user_id) VALUES (?, ?, ?)",
+                    [(cid, i, uid) for i, uid in enumerate(members)],
+                )
+                self.conn.execute("DELETE FROM active_events WHERE channel_id = ?", (cid,))
+                self.conn.executemany(
+                    "INSERT INTO active_events (channel_id, position, event, deadline) VALUES (?, ?, ?, ?)",
+                    [(cid, i, event, deadline) for i, (event, deadline) in enumerate(events)],
+                )
+
+            if snapshot["config"] is not None:
+                values, events = snapshot["config"]
+                self.conn.execute("DELETE FROM config_values")
+                self.conn.executemany("INSERT INTO config_values (scope, key, value) VALUES (?, ?, ?)", values)
+                self.conn.execute("DELETE FROM event_configs")
+                self.conn.executemany("INSERT INTO event_configs (scope, event, role, msg) VALUES (?, ?, ?, ?)", events)
+
+    async def close(self):
+        await super().close()
+        self.conn.close()
+
+
+class JournalStore(WriteBehindStore):
+    """Append-only mutation journal on top of a JSON snapshot.
+
+    Every squadron or config change is appended to the journal as one line,
+    so a save costs the size of the change instead of the whole file. The
+    journal is compacted into the snapshot once it grows past `max_bytes`
+    or its oldest entry is `max_age` seconds old. Startup loads the
+    snapshot and replays the journal on top of it.
+    """
+
+    def __init__(self, path, journal_path=None, max_bytes=1_000_000, max_age=600.0):
+        # The age threshold doubles as the write-behind delay of the compaction
+        super().__init__(path, flush_delay=max_age)
+        self.journal_path = journal_path or f"{path}.journal"
+        self.rotated_path = f"{self.journal_path}.old"
+        self.max_bytes = max_bytes
+        self._journal = None
+        self._journal_size = 0
+        self._needs_compaction = False
+
+    def load(self):
+        raw = {"schema_version": SCHEMA_VERSION}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+
+        # The rotated journal only survives if the last compaction never finished
+        replayed = self._replay(raw, self.rotated_path) + self._replay(raw, self.journal_path)
+        if replayed:
+            print(f"📜 Replayed {replayed} journal entries on top of {self.path}")
+        self.data, self.migrated = load_data(raw)
+
+        if self._journal is None:
+            self._truncate_torn_tail()
+            self._journal = open(self.journal_path, "a")
+        self._journal_size = os.path.getsize(self.journal_path)
+        self._needs_compaction = self._journal_size > 0 or os.path.exists(self.rotated_path)
+        return self.data
+
+    def _replay(self, raw, journal_path):
+        if not os.path.exists(journal_path):
+            return 0
+
+        count = 0
+        with open(journal_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-append, everything before it is intact
+                    print(f"⚠️ Skipping unreadable journal line in {journal_path}")
+                    continue
+                self._apply(raw, entry)
+                count += 1
+        return count
+
+    def _truncate_torn_tail(self):
+        # Cut a partial last line off so the next append starts on a fresh line
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb+") as f:
+            content = f.read()
+            if content and not content.endswith(b"\n"):
+                f.truncate(content.rfind(b"\n") + 1)
+
+    @staticmethod
+    def _apply(raw, entry):
+        # Entries are applied to the raw JSON dict before it is turned into the typed model
+        op = entry["op"]
+        if op == "put_squad":
+            raw.setdefault("squadrons", {})[entry["id"]] = entry["squad"]
+        elif op == "del_squad":
+            raw.setdefault("squadrons", {}).pop(entry["id"], None)
+        elif op == "put_config":
+            raw["server_configs"] = entry["configs"]
+
+    # --- JOURNALING ---
+    def mark_squad(self, channel_id):
+        squad = self.data.squadrons.get(int(channel_id))
+        if squad is None:
+            self._append({"op": "del_squad", "id": str(channel_id)})
+        else:
+            self._append({"op": "put_squad", "id": str(channel_id), "squad": squad.to_dict()})
+
+    def mark_config(self):
+        configs = {scope: cfg.to_dict() for scope, cfg in self.data.server_configs.items()}
+        self._append({"op": "put_config", "configs": configs})
+
+    def _append(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        self._journal.write(line)
+        self._journal.flush()
+        self._journal_size += len(line)
+
+        self._needs_compaction = True
+        self._schedule()
+        if self._journal_size >= self.max_bytes:
+            try:
+                asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass
+
+    # --- COMPACTION ---
+    def _mark_all(self):
+        self._needs_compaction = True
+
+    def has_pending(self):
+        return self._needs_compaction
+
+    def _take_snapshot(self):
+        # Rotate the journal so entries appended while the snapshot is written land in a fresh file
+        self._journal.close()
+        if os.path.exists(self.rotated_path):
+            with open(self.journal_path, "r") as src, open(self.rotated_path, "a") as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        elif os.path.exists(self.journal_path):
+            os.replace(self.journal_path, self.rotated_path)
+        self._journal = open(self.journal_path, "a")
+        self._journal_size = 0
+        self._needs_compaction = False
+        return self.data.to_dict()
+
+    def _restore_snapshot(self, snapshot):
+        self._needs_compaction = True
+
+    def _write(self, snapshot):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # The snapshot now contains everything in the rotated journal
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    async def close(self):
+        await super().close()
+        if self._journal:
+            self._journal.close()
+            self._journal = None
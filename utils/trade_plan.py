@@ -0,0 +1,144 @@
+from dataclasses import dataclass, field
+from math import floor
+
+# Dismantling returns 80% of the recipe amount
+DISMANTLE_RATE = 0.8
+# Short trade names used in base_guides -> inventory item names
+BASE_ITEMS = {"log": "wooden log", "fish": "normie fish", "apple": "apple", "ruby": "ruby"}
+
+# Item -> (what dismantling it gives, how many per item before DISMANTLE_RATE)
+DISMANTLE_RETURNS = {
+    "ultra log": ("hyper log", 10),
+    "hyper log": ("mega log", 10),
+    "mega log": ("super log", 10),
+    "super log": ("epic log", 10),
+    "epic log": ("wooden log", 25),
+    "banana": ("apple", 15),
+    "epic fish": ("golden fish", 100),
+    "golden fish": ("normie fish", 15)
+}
+
+# `rpg trade` letters; a bare item name is that item back to logs
+TRADE_IDS = {
+    "fish": "a", "apple": "c", "ruby": "e",
+    "log_to_fish": "b", "log_to_apple": "d", "log_to_ruby": "f",
+}
+
+# Area -> logs per item for each trade
+AREA_RATIOS = {
+    1: {"log_to_fish": 1}, 2: {"log_to_fish": 1},
+    3: {"log_to_fish": 1, "log_to_apple": 3},
+    4: {"log_to_fish": 2, "log_to_apple": 4},
+    5: {"log_to_fish": 2, "log_to_apple": 4, "log_to_ruby": 450},
+    6: {"log_to_fish": 3, "log_to_apple": 15, "log_to_ruby": 675},
+    7: {"log_to_fish": 3, "log_to_apple": 15, "log_to_ruby": 675},
+    8: {"log_to_fish": 3, "log_to_apple": 8, "log_to_ruby": 675},
+    9: {"log_to_fish": 2, "log_to_apple": 12, "log_to_ruby": 850},
+    10: {"log_to_fish": 3, "log_to_apple": 12, "log_to_ruby": 500},
+    11: {"log_to_ruby": 500}, 12: {"log_to_ruby": 500},
+    13: {"log_to_ruby": 500}, 14: {"log_to_ruby": 500},
+}
+
+# Logic area -> what to dismantle and which trades to run, in order
+BASE_GUIDES = {
+    2: {"dismantle": ["epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["log to fish"]},
+    3: {"dismantle": ["banana", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["apple to log", "log to fish"]},
+    4: {"dismantle": ["golden fish", "epic fish", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["fish to log", "log to apple"]},
+    5: {"dismantle": ["golden fish", "epic fish", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["ruby to log", "fish to log", "log to apple"]},
+    7: {"dismantle": ["banana"], "trades": ["apple to log"]},
+    8: {"dismantle": ["golden fish", "epic fish", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["ruby to log", "fish to log", "log to apple"]},
+    9: {"dismantle": ["banana", "epic log", "super log", "mega log", "hyper log", "ultra log"], "trades": ["ruby to log", "apple to log", "log to fish"]},
+    10: {"dismantle": ["banana"], "trades": ["apple to log"]},
+    11: {"dismantle": [], "trades": ["ruby to log"]},
+    12: {"dismantle": [], "trades": []},
+    15: {"dismantle": ["banana", "golden fish", "epic fish"], "trades": ["ruby to log", "fish to log"]}
+}
+# Areas that follow another area's guide
+AREA_MAP = {1: 2, 6: 7, 13: 12, 14: 12}
+
+
+@dataclass(slots=True)
+class PlanStep:
+    kind: str           # "dismantle" or "trade"
+    command: str        # what the user types, e.g. "rpg trade a all"
+    gives: str
+    gives_amount: int   # None when it depends on an earlier unknown yield
+    gets: str
+    gets_amount: int    # None when the area has no rate for this trade
+
+
+@dataclass(slots=True)
+class TradePlan:
+    steps: list = field(default_factory=list)
+    # Inventory after every step ran as planned, None for unknown counts
+    final: dict = field(default_factory=dict)
+    done: int = 0
+
+    @property
+    def current(self):
+        return self.steps[self.done] if self.done < len(self.steps) else None
+
+    def find(self, kind, gives, gets):
+        """Index of the first remaining step that turns `gives` into `gets`, or None."""
+        for index in range(self.done, len(self.steps)):
+            step = self.steps[index]
+            if step.kind == kind and step.gives == gives and step.gets == gets:
+                return index
+        return None
+
+
+def plan_trades(inventory, guide, ratios, dismantle_returns, trade_ids):
+    """Simulates the area's whole dismantle/trade sequence on a copy of the inventory.
+
+    Dismantles run first, highest tier first, so each one includes what the
+    previous one produced. Trades follow in guide order. Every command is an
+    `all` command, and steps that would do nothing are left out. `ratios` are
+    the area's logs-per-item rates (`log_to_fish`, ...). A trade back to logs
+    without a rate is still planned, with an unknown (None) yield.
+    """
+    inv = dict(inventory)
+    plan = TradePlan()
+
+    for item in reversed(guide["dismantle"]):
+        amount = inv.get(item, 0)
+        recipe = dismantle_returns.get(item)
+        if amount <= 0 or recipe is None:
+            continue
+        yield_item, per_item = recipe
+        got = floor(amount * per_item * DISMANTLE_RATE)
+        inv[item] = 0
+        inv[yield_item] = inv.get(yield_item, 0) + got
+        plan.steps.append(PlanStep("dismantle", f"rpg dismantle {item} all", item, amount, yield_item, got))
+
+    logs = BASE_ITEMS["log"]
+    for trade in guide["trades"]:
+        source, target = trade.split(" to ")
+        if source == "log":
+            key, rate = f"log_to_{target}", ratios.get(f"log_to_{target}")
+            if not rate:
+                continue
+            gives, gets = logs, BASE_ITEMS[target]
+            have = inv.get(logs, 0)
+            got = have // rate if have is not None else None
+            gives_amount = got * rate if got is not None else None
+        else:
+            # Trading an item back to logs uses the same rate from the other side
+            key, rate = source, ratios.get(f"log_to_{source}")
+            gives, gets = BASE_ITEMS[source], logs
+            gives_amount = inv.get(gives, 0)
+            got = gives_amount * rate if rate and gives_amount is not None else None
+
+        tid = trade_ids.get(key)
+        if not tid or gives_amount == 0 or got == 0:
+            continue
+        inv[gives] = inv[gives] - gives_amount if gives_amount is not None else None
+        have = inv.get(gets, 0)
+        inv[gets] = have + got if have is not None and got is not None else None
+        plan.steps.append(PlanStep("trade", f"rpg trade {tid} all", gives, gives_amount, gets, got))
+
+    plan.final = {item: count for item, count in inv.items() if count != 0}
+    return plan
+
+
+def format_amount(amount):
+    return f"{amount:,}" if amount is not None else "?"